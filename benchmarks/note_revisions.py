@@ -0,0 +1,91 @@
+"""Revision history in notes-api: delta-encoded storage against keeping every version in full.
+
+One note of about 60 KB is saved repeatedly with a few lines changed each
+time, through app.revisions.save_revision, as PUT /notes/{id} does. Every
+revision is then rebuilt with read_revision and checked against the version
+that was saved.
+
+    python benchmarks/note_revisions.py [saves] [changed lines per save]
+"""
+from statistics import median, quantiles
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "notes-api")
+NOTE_LINES = 1000
+
+def p95(times):
+    return quantiles(times, n=20)[-1] if len(times) > 1 else times[0]
+
+if __name__ == "__main__":
+    saves = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    changed_lines = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    # The app opens notes.db relative to the working directory
+    sys.path.insert(0, APP_DIR)
+    os.chdir(tempfile.mkdtemp(prefix="note-revisions-bench-"))
+    from sqlalchemy import func, select
+    from sqlmodel import SQLModel, Session
+    from app.database import engine
+    from app.models import Note, NoteRevision
+    from app.revisions import read_revision, save_revision
+
+    logging.disable(logging.WARNING)
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(42)
+
+    def random_line() -> str:
+        return " ".join(f"w{rng.randrange(20000)}" for _ in range(10)) + "\n"
+
+    lines = [random_line() for _ in range(NOTE_LINES)]
+    versions = ["".join(lines)]
+    with Session(engine) as session:
+        note = Note(title="version 1", content=versions[0])
+        session.add(note)
+        session.commit()
+        session.refresh(note)
+
+        save_times = []
+        for number in range(2, saves + 2):
+            for index in rng.sample(range(len(lines)), changed_lines):
+                lines[index] = random_line()
+            versions.append("".join(lines))
+            started = time.perf_counter()
+            save_revision(session, note, f"version {number}", versions[-1])
+            session.commit()
+            save_times.append((time.perf_counter() - started) * 1000)
+
+        stored = session.execute(select(func.sum(func.length(NoteRevision.__table__.c.body)))).scalar()
+        history = versions[:-1]
+        full_copies = sum(len(version.encode()) for version in history)
+        compressed_copies = sum(len(zlib.compress(version.encode())) for version in history)
+
+        read_times = []
+        for revision, expected in enumerate(versions, 1):
+            session.expire_all()
+            started = time.perf_counter()
+            note = session.get(Note, note.id)
+            content = read_revision(session, note, revision)["content"]
+            read_times.append((time.perf_counter() - started) * 1000)
+            assert content == expected, f"revision {revision} differs"
+
+        # The cost a history of full (compressed) copies would have per read
+        copy_times = []
+        for _ in range(len(versions)):
+            session.expire_all()
+            started = time.perf_counter()
+            session.execute(select(Note.__table__.c.content).where(Note.__table__.c.id == note.id)).scalar()
+            copy_times.append((time.perf_counter() - started) * 1000)
+
+    print(f"{len(versions[0]) / 1024:.0f} KB note, {saves} saves of {changed_lines} changed lines")
+    print(f"history storage     {stored / 1024:10.0f} KB stored")
+    print(f"  as full copies    {full_copies / 1024:10.0f} KB ({compressed_copies / 1024:.0f} KB zlib-compressed)")
+    print(f"save a revision     p50 {median(save_times):7.2f} ms  p95 {p95(save_times):7.2f} ms")
+    print(f"read any revision   p50 {median(read_times):7.2f} ms  p95 {p95(read_times):7.2f} ms")
+    print(f"read one full copy  p50 {median(copy_times):7.2f} ms  p95 {p95(copy_times):7.2f} ms")
+    print(f"all {len(versions)} revisions rebuilt exactly")
@@ -0,0 +1,97 @@
+"""Full-text search in notes-api: the FTS5 index against the LIKE scan it replaces.
+
+Notes are synthetic: 60-word bodies and 4-word titles drawn uniformly from a
+20,000-word vocabulary ("w0" to "w19999"), so any one word is in about 0.3%
+of notes. One note in a hundred also contains "alpha database" or "timeout
+error". Search times are per page of 20, through app.search.search_notes.
+
+    python benchmarks/notes_search.py [notes] [repeats]
+"""
+from statistics import median
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "notes-api")
+VOCABULARY = [f"w{i}" for i in range(20000)]
+PHRASES = ["alpha database", "timeout error"]
+QUERIES = ["w17", "alpha database", "timeout error", "w12*"]
+PAGE_SIZE = 20
+
+def make_notes(count: int, rng: random.Random):
+    now = datetime.now()
+    for _ in range(count):
+        words = rng.choices(VOCABULARY, k=60)
+        if rng.random() < 0.01:
+            words.insert(rng.randrange(len(words)), rng.choice(PHRASES))
+        yield {"title": " ".join(rng.choices(VOCABULARY, k=4)), "content": " ".join(words), "created_at": now}
+
+def timed(fn, repeats: int):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return median(times), result
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    # The app opens notes.db relative to the working directory
+    sys.path.insert(0, APP_DIR)
+    os.chdir(tempfile.mkdtemp(prefix="notes-search-bench-"))
+    from datetime import datetime
+    from sqlalchemy import insert, text
+    from sqlmodel import SQLModel, Session
+    from app.database import engine
+    from app.models import Note
+    from app.search import ensure_search_index, match_expression, search_notes
+
+    # Every statement of the index build and of the broad prefix search is over the slow-query threshold
+    logging.disable(logging.WARNING)
+
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(42)
+    notes = make_notes(count, rng)
+    with Session(engine) as session:
+        while True:
+            batch = [note for _, note in zip(range(10000), notes)]
+            if not batch:
+                break
+            session.execute(insert(Note.__table__), batch)
+        session.commit()
+    print(f"{count} notes")
+
+    started = time.perf_counter()
+    ensure_search_index(engine)
+    print(f"initial index build         {time.perf_counter() - started:8.2f} s")
+    started = time.perf_counter()
+    ensure_search_index(engine)
+    print(f"startup check, index built  {time.perf_counter() - started:8.2f} s")
+
+    with Session(engine) as session:
+        for q in QUERIES:
+            first_ms, (rows, cursor) = timed(lambda: search_notes(session, q, PAGE_SIZE), repeats)
+            line = f"search {q!r:18} page 1 p50 {first_ms:8.2f} ms"
+            if cursor is not None:
+                second_ms, _ = timed(lambda: search_notes(session, q, PAGE_SIZE, cursor), repeats)
+                line += f"   page 2 p50 {second_ms:8.2f} ms"
+            matches = session.execute(
+                text("SELECT count(*) FROM note_fts WHERE note_fts MATCH :match"), {"match": match_expression(q)}
+            ).scalar()
+            print(f"{line}   ({matches} matches)")
+
+        # What clients had before: a substring scan of every note. Only phrases
+        # are compared, since '%w17%' would also match w170 to w17999.
+        for q in PHRASES:
+            scan_ms, matches = timed(
+                lambda: session.execute(
+                    text("SELECT count(*) FROM note WHERE content LIKE :pattern"), {"pattern": f"%{q}%"}
+                ).scalar(),
+                max(repeats // 4, 1)
+            )
+            print(f"LIKE scan {q!r:18} p50 {scan_ms:8.2f} ms   ({matches} matches)")
@@ -0,0 +1,86 @@
+"""Concurrent read/write throughput: SQLAlchemy's default SQLite engine vs common.sqlite_engine.
+
+Readers and writers run on threads, as sync FastAPI endpoints do on the
+threadpool. Each write is its own committed transaction; each read is a
+small indexed SELECT.
+
+    python benchmarks/sqlite_engine.py [seconds] [readers] [writers]
+"""
+from sqlalchemy import text
+from sqlmodel import create_engine
+from common.sqlite_engine import create_sqlite_engine
+import os
+import sys
+import tempfile
+import threading
+import time
+
+SETUP = [
+    "CREATE TABLE item (id INTEGER PRIMARY KEY, owner INTEGER NOT NULL, name TEXT NOT NULL)",
+    "CREATE INDEX ix_item_owner ON item (owner)",
+]
+
+def run(engine, seconds: float, readers: int, writers: int):
+    with engine.begin() as connection:
+        for statement in SETUP:
+            connection.execute(text(statement))
+        connection.execute(
+            text("INSERT INTO item (owner, name) VALUES (:owner, :name)"),
+            [{"owner": i % 100, "name": f"item {i}"} for i in range(10000)]
+        )
+
+    counts = {"read": 0, "write": 0, "error": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker(kind: str, number: int):
+        done = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                if kind == "read":
+                    with engine.connect() as connection:
+                        connection.execute(
+                            text("SELECT id, name FROM item WHERE owner = :owner LIMIT 20"), {"owner": done % 100}
+                        ).all()
+                else:
+                    with engine.begin() as connection:
+                        connection.execute(
+                            text("INSERT INTO item (owner, name) VALUES (:owner, :name)"),
+                            {"owner": number, "name": "new"}
+                        )
+                done += 1
+            except Exception:
+                # "database is locked" once busy_timeout runs out
+                errors += 1
+        with lock:
+            counts[kind] += done
+            counts["error"] += errors
+
+    threads = [threading.Thread(target=worker, args=("read", i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=("write", i)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return {kind: count / seconds if kind != "error" else count for kind, count in counts.items()}
+
+if __name__ == "__main__":
+    seconds, readers, writers = 5.0, 16, 4
+    if len(sys.argv) > 1:
+        seconds = float(sys.argv[1])
+    if len(sys.argv) > 2:
+        readers = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        writers = int(sys.argv[3])
+
+    with tempfile.TemporaryDirectory() as directory:
+        engines = {
+            "default": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+            "tuned": create_sqlite_engine,
+        }
+        print(f"{seconds:g}s, {readers} reader threads, {writers} writer threads")
+        for name, factory in engines.items():
+            url = f"sqlite:///{os.path.join(directory, name + '.db')}"
+            result = run(factory(url), seconds, readers, writers)
+            print(f"{name:8} reads/s {result['read']:9.0f}  writes/s {result['write']:8.0f}  errors {result['error']}")
@@ -0,0 +1,54 @@
+"""Authenticated requests in student_management with and without the verified-credential cache.
+
+Every request sends the same HTTP Basic credentials to POST /students/, the
+protected /students/ route (GET /students/ is public), and inserts one student.
+Without the cache each one pays a full bcrypt check at BCRYPT_ROUNDS (default 12)
+on top of the route's own database work.
+
+    python benchmarks/student_auth_cache.py [requests]
+"""
+import os
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "student_management")
+# Every uncached check spends a rate-limit token; this measures hashing, not the limiter
+os.environ.setdefault("RATE_LIMIT_IP_BURST", "1000000")
+os.environ.setdefault("RATE_LIMIT_USERNAME_BURST", "1000000")
+
+def run(client, name: str, requests: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        student = {"name": f"Student {i}", "age": 20, "email": f"{name}-{i}@example.com"}
+        response = client.post("/students/", json=student, auth=("bench", "bench-password"))
+        assert response.status_code == 201, response.text
+    return time.perf_counter() - started
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    # The app opens students.db and users.json relative to the working directory
+    sys.path.insert(0, APP_DIR)
+    os.chdir(tempfile.mkdtemp(prefix="student-auth-bench-"))
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session
+    from main import app
+    from models import User, engine
+    import auth
+
+    with TestClient(app) as client:
+        with Session(engine) as session:
+            session.add(User(
+                username="bench",
+                email="bench@example.com",
+                hashed_password=auth.hash_password("bench-password")
+            ))
+            session.commit()
+
+        print(f"{requests} requests to POST /students/, bcrypt rounds {auth.BCRYPT_ROUNDS}")
+        ttl = auth.credential_cache.ttl
+        for name, cache_ttl in (("uncached", 0.0), ("cached", ttl)):
+            auth.credential_cache.ttl = cache_ttl
+            elapsed = run(client, name, requests)
+            print(f"{name:9} total {elapsed:7.3f}s  per request {elapsed / requests * 1000:8.2f} ms")
@@ -0,0 +1,5 @@
+"""Modules shared by every app in this repository.
+
+Each app's requirements.txt installs this package from the repository root
+(pip install -r requirements.txt, run from the app's directory).
+"""
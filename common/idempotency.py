@@ -0,0 +1,209 @@
+from sqlalchemy import Column, LargeBinary, delete, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Field, Session, SQLModel
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Iterable, Optional, Tuple
+from datetime import datetime, timedelta
+import anyio
+import hashlib
+import json
+import os
+
+IDEMPOTENCY_TTL = timedelta(hours=24)
+# A request in flight holds its key this long. If its worker dies without
+# releasing the key, a retry after this gets to run the request again.
+IDEMPOTENCY_LEASE = timedelta(seconds=float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60")))
+# Per-request diagnostics, which would be wrong on a replayed response
+UNSTORED_HEADERS = frozenset([b"x-db-queries", b"x-db-time", b"x-process-time"])
+# Expired records are purged every this many new keys
+PURGE_EVERY = 1000
+
+# Stored responses for requests sent with an Idempotency-Key header
+class IdempotencyRecord(SQLModel, table=True):
+    key: str = Field(primary_key=True)
+    fingerprint: str
+    status_code: Optional[int] = None
+    headers: str = Field(default="[]")
+    body: bytes = Field(default=b"", sa_column=Column(LargeBinary, nullable=False))
+    # The lease's end while status_code is None, the record's expiry after that
+    expires_at: datetime = Field(index=True)
+
+class IdempotencyStore:
+    """Idempotency records in the idempotencyrecord table of engine's database."""
+
+    def __init__(self, engine, ttl: timedelta = IDEMPOTENCY_TTL, lease: timedelta = IDEMPOTENCY_LEASE):
+        self.engine = engine
+        self.ttl = ttl
+        self.lease = lease
+        self._claims = 0
+
+    def claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[IdempotencyRecord]]:
+        """Reserve key for this request.
+
+        Returns ("new", record) when the caller should run the request, ("replay",
+        record) when a stored response exists, or ("conflict", record) when the
+        key is in flight or was used for a different request. A new record's
+        expires_at identifies the claim to complete() and release().
+        """
+        with Session(self.engine) as session:
+            now = datetime.utcnow()
+            self._claims += 1
+            if self._claims % PURGE_EVERY == 0:
+                session.execute(delete(IdempotencyRecord.__table__).where(IdempotencyRecord.__table__.c.expires_at < now))
+
+            claimed = IdempotencyRecord(key=key, fingerprint=fingerprint, headers="[]", body=b"", expires_at=now + self.lease)
+            statement = sqlite_insert(IdempotencyRecord.__table__).values(
+                key=key, fingerprint=fingerprint, headers="[]", body=b"", expires_at=claimed.expires_at
+            ).on_conflict_do_nothing(index_elements=["key"])
+            if session.execute(statement).rowcount == 1:
+                session.commit()
+                return "new", claimed
+
+            record = session.get(IdempotencyRecord, key)
+            if record is None or record.expires_at < now:
+                # Expired, abandoned in flight, or purged meanwhile: take the key over
+                if record is not None:
+                    session.delete(record)
+                session.commit()
+                return self.claim(key, fingerprint)
+
+            if record.fingerprint == fingerprint and record.status_code is not None:
+                return "replay", record
+            return "conflict", record
+
+    def _claim_is(self, claim: IdempotencyRecord):
+        # Matches the claim only while it is still ours: not completed, and not
+        # taken over by a retry after its lease ran out
+        table = IdempotencyRecord.__table__
+        return (table.c.key == claim.key) & (table.c.expires_at == claim.expires_at) & table.c.status_code.is_(None)
+
+    def complete(self, claim: IdempotencyRecord, status_code: int, headers: Iterable[Tuple[bytes, bytes]], body: bytes):
+        with Session(self.engine) as session:
+            session.execute(update(IdempotencyRecord.__table__).where(self._claim_is(claim)).values(
+                status_code=status_code,
+                headers=json.dumps([
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in headers if name.lower() not in UNSTORED_HEADERS
+                ]),
+                body=body,
+                expires_at=datetime.utcnow() + self.ttl
+            ))
+            session.commit()
+
+    def release(self, claim: IdempotencyRecord):
+        # Forget a key whose request failed so the client can retry it for real
+        with Session(self.engine) as session:
+            session.execute(delete(IdempotencyRecord.__table__).where(self._claim_is(claim)))
+            session.commit()
+
+class IdempotencyMiddleware:
+    """Replay the stored response for POSTs retried with the same Idempotency-Key.
+
+    Only requests to the given paths are handled, and a key reused with a
+    different body is rejected. Keys are scoped to the caller: subject maps the
+    Authorization header to the authenticated user, or None when it does not
+    authenticate anyone. It runs on the threadpool.
+    """
+
+    def __init__(
+        self,
+        app,
+        paths: Iterable[str],
+        store: IdempotencyStore,
+        subject: Optional[Callable[[str], Optional[str]]] = None
+    ):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.store = store
+        self.subject = subject
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key")
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        # Buffer the body so it can be fingerprinted and then handed to the app
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        # Anonymous callers share one scope
+        subject = None
+        authorization = headers.get(b"authorization")
+        if authorization and self.subject is not None:
+            subject = await run_in_threadpool(self.subject, authorization.decode("latin-1"))
+        key = hashlib.sha256(b"\0".join([
+            idempotency_key, b"user" if subject is not None else b"anonymous", (subject or "").encode()
+        ])).hexdigest()
+        fingerprint = hashlib.sha256(
+            b"\0".join([scope["method"].encode(), scope["path"].encode(), scope["query_string"], body])
+        ).hexdigest()
+
+        outcome, record = await run_in_threadpool(self.store.claim, key, fingerprint)
+        if outcome == "replay":
+            await self._send_stored(send, record)
+            return
+        if outcome == "conflict":
+            detail = "A request with this Idempotency-Key is still in progress" if record.fingerprint == fingerprint \
+                else "Idempotency-Key was already used for a different request"
+            await self._send_json(send, 409 if record.fingerprint == fingerprint else 422, {"detail": detail})
+            return
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": 500, "headers": [], "body": b""}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            # Crashed or cancelled (e.g. the client went away): free the key now
+            # rather than when the lease runs out. Shielded so a cancellation
+            # does not also cancel the release.
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self.store.release, record)
+            raise
+
+        # Server errors are not stored so a retry gets a real second attempt
+        if response["status"] >= 500:
+            await run_in_threadpool(self.store.release, record)
+        else:
+            await run_in_threadpool(self.store.complete, record, response["status"], response["headers"], response["body"])
+
+    async def _send_stored(self, send, record: IdempotencyRecord):
+        headers = [[name.encode("latin-1"), value.encode("latin-1")] for name, value in json.loads(record.headers)]
+        headers.append([b"idempotent-replayed", b"true"])
+        await send({"type": "http.response.start", "status": record.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": record.body})
+
+    async def _send_json(self, send, status_code: int, content: dict):
+        body = json.dumps(content).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [[b"content-type", b"application/json"], [b"content-length", str(len(body)).encode()]]
+        })
+        await send({"type": "http.response.body", "body": body})
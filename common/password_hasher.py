@@ -0,0 +1,115 @@
+from fastapi import HTTPException, status
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+import threading
+import time
+import os
+
+# bcrypt is slow on purpose. It runs on its own small pool so a burst of logins
+# cannot take every threadpool thread away from ordinary requests.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Callers allowed to wait for a busy worker; anyone beyond that gets a 503 right away.
+# Callers are sync endpoints, and each one waiting holds a threadpool thread
+# (40 by default), so workers + queue must stay well below that.
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", str(PASSWORD_HASH_WORKERS)))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "1"))
+# Work factor for new hashes. Changing it rehashes each user's password on their next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+class PasswordHasher:
+    """Bounded executor with admission control for password hashing.
+
+    context is a passlib CryptContext, or anything offering its hash, verify,
+    verify_and_update and needs_update methods.
+    """
+
+    def __init__(
+        self,
+        context: Any,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+        retry_after: int = PASSWORD_HASH_RETRY_AFTER_SECONDS
+    ):
+        self.context = context
+        self.workers = max(workers, 1)
+        self.max_queue = max(max_queue, 0)
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._shed = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._hash_time_total = 0.0
+        self._hash_time_max = 0.0
+
+    def _run(self, fn: Callable, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._shed += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password checks in progress, please retry",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self._record(started - submitted, time.perf_counter() - started)
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return self._executor.submit(timed).result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _record(self, queue_wait: float, hash_time: float):
+        with self._lock:
+            self._completed += 1
+            self._queue_wait_total += queue_wait
+            self._queue_wait_max = max(self._queue_wait_max, queue_wait)
+            self._hash_time_total += hash_time
+            self._hash_time_max = max(self._hash_time_max, hash_time)
+
+    def hash(self, password: str) -> str:
+        return self._run(self.context.hash, password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self._run(self.context.verify, password, hashed_password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Check password; on success also return a new hash if the stored one is outdated."""
+        return self._run(self.context.verify_and_update, password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        # Only parses the hash, so it does not need the pool
+        return self.context.needs_update(hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "shed": self._shed,
+                "queue_wait_ms": {
+                    "avg": round(self._queue_wait_total / completed * 1000, 3),
+                    "max": round(self._queue_wait_max * 1000, 3)
+                },
+                "hash_time_ms": {
+                    "avg": round(self._hash_time_total / completed * 1000, 3),
+                    "max": round(self._hash_time_max * 1000, 3)
+                }
+            }
@@ -0,0 +1,113 @@
+from fastapi import HTTPException
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import re
+import os
+
+# Make check_query_plans raise when a filtered query scans a whole table (for test runs)
+QUERY_AUDIT_STRICT = os.getenv("QUERY_AUDIT_STRICT", "false").lower() in ("1", "true", "yes")
+# GET /metrics/query-plans runs EXPLAIN on demand, so it is off unless debugging
+QUERY_AUDIT_ENDPOINT = os.getenv("QUERY_AUDIT_ENDPOINT", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("sql.audit")
+
+_SCAN_RE = re.compile(r"^SCAN (\w+)")
+_WHERE_RE = re.compile(r"\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+_ORDER_RE = re.compile(r"\bORDER BY\b(.*?)(?:\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+_EQUALITY_OPERATORS = ("=", "IN", "IS")
+
+def explain(cursor, statement: str, param_count: int) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines for statement, with NULL bound to every parameter."""
+    cursor.execute(f"EXPLAIN QUERY PLAN {statement}", (None,) * param_count)
+    return [row[3] for row in cursor.fetchall()]
+
+def _column_conditions(clause: str, table: str) -> List[Tuple[str, str]]:
+    pattern = re.compile(rf'"?\b{re.escape(table)}\b"?\.(\w+)\s*(=|IN\b|IS\b|>=|<=|>|<|BETWEEN\b)', re.IGNORECASE)
+    return [(column, operator.upper()) for column, operator in pattern.findall(clause)]
+
+def suggest_index(statement: str, table: str) -> Optional[str]:
+    """Propose an index for table: equality columns first, then one range column, then ORDER BY."""
+    where = _WHERE_RE.search(statement)
+    if where is None:
+        return None
+
+    columns: List[str] = []
+    conditions = _column_conditions(where.group(1), table)
+    for column, operator in conditions:
+        if operator in _EQUALITY_OPERATORS and column not in columns:
+            columns.append(column)
+    # Index columns after a range condition are only usable for that range
+    ranges = [column for column, operator in conditions if operator not in _EQUALITY_OPERATORS and column not in columns]
+    if ranges:
+        columns.append(ranges[0])
+    else:
+        order = _ORDER_RE.search(statement)
+        if order is not None:
+            for column in re.findall(rf'"?\b{re.escape(table)}\b"?\.(\w+)', order.group(1)):
+                if column not in columns:
+                    columns.append(column)
+
+    if not columns:
+        return None
+    return f"CREATE INDEX ix_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+
+def audit_query_plans(engine, statements: Iterable[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    """Report every statement whose plan reads a whole table.
+
+    statements are (statement, parameter count) pairs, e.g. query_stats.examples().
+    """
+    findings = []
+    # A raw DBAPI connection, so the audit's own statements stay out of the query log
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # EXPLAIN does not check whether the schema changed, so read it first:
+        # a pooled connection would otherwise plan with indexes dropped since
+        cursor.execute("SELECT count(*) FROM sqlite_master").fetchall()
+        for statement, param_count in statements:
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            plan = explain(cursor, statement, param_count)
+            for detail in plan:
+                scan = _SCAN_RE.match(detail)
+                # "SCAN t USING INDEX ..." walks an index, not the table; virtual tables
+                # (FTS5) plan through their own index
+                if scan is None or "USING" in detail or "VIRTUAL TABLE" in detail:
+                    continue
+                table = scan.group(1)
+                findings.append({
+                    "statement": " ".join(statement.split()),
+                    "table": table,
+                    "plan": plan,
+                    "suggested_index": suggest_index(statement, table)
+                })
+    finally:
+        # Discarded rather than pooled: sqlite3 caches the compiled EXPLAINs and
+        # would replay their plans to the next audit even after a schema change
+        connection.invalidate()
+    return findings
+
+def check_query_plans(engine, statements: Iterable[Tuple[str, int]], strict: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """audit_query_plans, logging scans an index would fix and raising AssertionError
+    for them in strict mode (QUERY_AUDIT_STRICT unless given).
+
+    Scans with nothing to index (no filter, or LIKE '%...%') are reported but never fail.
+    Every app runs it over the statements it saw when it shuts down, so a strict
+    test run fails on exit.
+    """
+    if strict is None:
+        strict = QUERY_AUDIT_STRICT
+    findings = audit_query_plans(engine, statements)
+    fixable = [finding for finding in findings if finding["suggested_index"]]
+    for finding in fixable:
+        logger.warning("Full table scan: %s -> %s", finding["statement"], finding["suggested_index"])
+    if strict and fixable:
+        raise AssertionError("Full table scans:\n" + "\n".join(
+            f"{finding['statement']}\n  -> {finding['suggested_index']}" for finding in fixable
+        ))
+    return findings
+
+def require_query_audit_endpoint():
+    """Dependency hiding an endpoint (404) unless QUERY_AUDIT_ENDPOINT is set."""
+    if not QUERY_AUDIT_ENDPOINT:
+        raise HTTPException(status_code=404, detail="Not Found")
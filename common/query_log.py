@@ -0,0 +1,225 @@
+from sqlalchemy import event
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
+import threading
+import time
+import os
+
+# Statements slower than this are logged (without their parameters)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Latest durations kept per query shape for the percentiles
+QUERY_LOG_SAMPLES = int(os.getenv("QUERY_LOG_SAMPLES", "1000"))
+QUERY_LOG_MAX_SHAPES = int(os.getenv("QUERY_LOG_MAX_SHAPES", "1000"))
+# Turn an endpoint going over its query_budget into an AssertionError (for test runs)
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("sql.slow")
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE_RE = re.compile(r"\s+")
+# "IN (?, ?, ?)" and multi-row VALUES lists collapse to one shape whatever their length
+_LIST_RE = re.compile(r"\(\?(?:, ?\?)+\)")
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so queries differing only in literals share one shape."""
+    statement = _STRING_RE.sub("?", statement)
+    statement = _NUMBER_RE.sub("?", statement)
+    statement = _SPACE_RE.sub(" ", statement).strip()
+    return _LIST_RE.sub("(?+)", statement)
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class QueryShape:
+    def __init__(self, samples: int, example: str, param_count: int):
+        # One real statement of this shape, kept for EXPLAIN QUERY PLAN
+        self.example = example
+        self.param_count = param_count
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.durations = deque(maxlen=samples)
+
+class QueryStats:
+    """Count, total and recent latencies per statement fingerprint."""
+
+    def __init__(self, samples: int = QUERY_LOG_SAMPLES, max_shapes: int = QUERY_LOG_MAX_SHAPES):
+        self.samples = samples
+        self.max_shapes = max_shapes
+        self._shapes: Dict[str, QueryShape] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float, param_count: int = 0):
+        shape_key = fingerprint(statement)
+        with self._lock:
+            shape = self._shapes.get(shape_key)
+            if shape is None:
+                # Past the cap, new shapes are pooled so memory stays bounded
+                if len(self._shapes) >= self.max_shapes:
+                    shape_key = "<other>"
+                shape = self._shapes.setdefault(shape_key, QueryShape(self.samples, statement, param_count))
+            shape.count += 1
+            shape.total += duration
+            shape.max = max(shape.max, duration)
+            shape.durations.append(duration)
+
+    def top(self, limit: int = 20, sort: str = "total") -> List[Dict[str, Any]]:
+        with self._lock:
+            snapshot = [
+                (statement, shape.count, shape.total, shape.max, sorted(shape.durations))
+                for statement, shape in self._shapes.items()
+            ]
+
+        rows = [
+            {
+                "statement": statement,
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "p50_ms": round(_percentile(durations, 0.5) * 1000, 3),
+                "p95_ms": round(_percentile(durations, 0.95) * 1000, 3),
+                "max_ms": round(maximum * 1000, 3)
+            }
+            for statement, count, total, maximum, durations in snapshot
+        ]
+        sort_key = {"total": "total_ms", "p95": "p95_ms", "max": "max_ms", "count": "count"}[sort]
+        rows.sort(key=lambda row: row[sort_key], reverse=True)
+        return rows[:limit]
+
+    def examples(self) -> List[Tuple[str, int]]:
+        """(statement, parameter count) for one statement of every recorded shape."""
+        with self._lock:
+            return [
+                (shape.example, shape.param_count)
+                for shape_key, shape in self._shapes.items() if shape_key != "<other>"
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+query_stats = QueryStats()
+
+class RequestQueries:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.budget: Optional[int] = None
+
+# Set by QueryCountMiddleware for the duration of each HTTP request
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+class RouteQueryStats:
+    """Statements and DB time per request, aggregated by route."""
+
+    def __init__(self):
+        # route -> [requests, queries, max queries, db time, over budget]
+        self._routes: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, request: RequestQueries, over_budget: bool):
+        with self._lock:
+            totals = self._routes.setdefault(route, [0, 0, 0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += request.count
+            totals[2] = max(totals[2], request.count)
+            totals[3] += request.time
+            totals[4] += over_budget
+
+    def summary(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [
+                {
+                    "route": route,
+                    "requests": requests,
+                    "avg_queries": round(queries / requests, 2),
+                    "max_queries": max_queries,
+                    "avg_db_ms": round(db_time / requests * 1000, 3),
+                    "over_budget": over_budget
+                }
+                for route, (requests, queries, max_queries, db_time, over_budget) in self._routes.items()
+            ]
+        rows.sort(key=lambda row: row["avg_queries"], reverse=True)
+        return rows
+
+route_query_stats = RouteQueryStats()
+
+def query_budget(max_queries: int):
+    """Dependency declaring how many statements an endpoint may run per request."""
+
+    async def declare_query_budget():
+        current = _request_queries.get()
+        if current is not None:
+            current.budget = max_queries
+
+    return declare_query_budget
+
+class QueryCountMiddleware:
+    """Count statements per request and report them as X-DB-Queries / X-DB-Time (ms)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        current = RequestQueries()
+        token = _request_queries.set(current)
+
+        async def send_with_counts(message):
+            if message["type"] == "http.response.start":
+                # The router has put the matched route in scope by now
+                route = scope.get("route")
+                route_name = f"{scope['method']} {route.path}" if route is not None else "<unmatched>"
+                over_budget = current.budget is not None and current.count > current.budget
+                route_query_stats.record(route_name, current, over_budget)
+                if over_budget:
+                    detail = f"{route_name} ran {current.count} queries, budget is {current.budget}"
+                    if QUERY_BUDGET_STRICT:
+                        raise AssertionError(detail)
+                    logger.warning("Query budget exceeded: %s", detail)
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-db-queries", str(current.count).encode()),
+                    (b"x-db-time", f"{current.time * 1000:.2f}".encode())
+                ])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_counts)
+        finally:
+            _request_queries.reset(token)
+
+def install_query_log(engine):
+    """Time every statement run on engine, record it by shape and log slow ones."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        # executemany passes a list of parameter sets
+        example_parameters = parameters[0] if executemany and parameters else parameters
+        query_stats.record(statement, duration, len(example_parameters or ()))
+        current = _request_queries.get()
+        if current is not None:
+            current.count += 1
+            current.time += duration
+        if duration * 1000 >= SLOW_QUERY_MS:
+            logger.warning("Slow query (%.1f ms): %s", duration * 1000, fingerprint(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def drop_timer(exception_context):
+        # after_cursor_execute does not run for failed statements
+        if exception_context.connection is not None:
+            started = exception_context.connection.info.get("query_started")
+            if started:
+                started.pop()
@@ -0,0 +1,166 @@
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+from collections import OrderedDict
+from typing import Optional, Tuple
+import math
+import sqlite3
+import threading
+import time
+import os
+
+# "memory" keeps buckets in this process; "sqlite" keeps them in a local file so
+# every uvicorn worker on the host shares the same limits
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "rate_limit.db")
+# Login attempts allowed in a burst, and how many more are allowed per minute after that
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "30"))
+RATE_LIMIT_USERNAME_BURST = float(os.getenv("RATE_LIMIT_USERNAME_BURST", "5"))
+RATE_LIMIT_USERNAME_PER_MINUTE = float(os.getenv("RATE_LIMIT_USERNAME_PER_MINUTE", "5"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Buckets idle this long have refilled completely and can be forgotten
+RATE_LIMIT_IDLE_SECONDS = 3600
+PRUNE_EVERY = 1000
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> Tuple[float, float]:
+    """Take one token from a bucket; returns (tokens left, seconds to wait or 0)."""
+    tokens = min(capacity, tokens + max(now - updated, 0.0) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+class MemoryBucketStore:
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (tokens, updated)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, wait = _refill(tokens, updated, now, capacity, rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # The least recently used bucket is the one most likely to be full already
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+class SQLiteBucketStore:
+    """Buckets in a small SQLite file shared by all workers on this host.
+
+    Each take is one short BEGIN IMMEDIATE transaction. The file holds nothing
+    worth keeping across a crash, so it runs with synchronous=OFF and a write
+    costs microseconds rather than an fsync.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row is not None else (capacity, now)
+            tokens, wait = _refill(tokens, updated, now, capacity, rate)
+            connection.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now)
+            )
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                connection.execute(
+                    "DELETE FROM rate_limit_buckets WHERE updated < ?", (now - RATE_LIMIT_IDLE_SECONDS,)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+class RateLimiter:
+    """Per-IP and per-username token buckets for credential checks."""
+
+    def __init__(
+        self,
+        store,
+        ip_burst: float = RATE_LIMIT_IP_BURST,
+        ip_per_minute: float = RATE_LIMIT_IP_PER_MINUTE,
+        username_burst: float = RATE_LIMIT_USERNAME_BURST,
+        username_per_minute: float = RATE_LIMIT_USERNAME_PER_MINUTE
+    ):
+        self.store = store
+        self.ip_limit = (ip_burst, ip_per_minute / 60)
+        self.username_limit = (username_burst, username_per_minute / 60)
+
+    def check(self, ip: Optional[str], username: Optional[str] = None):
+        """Spend one token from each bucket, or raise 429 if either is empty."""
+        wait = 0.0
+        if ip:
+            wait = self.store.take(f"ip:{ip}", *self.ip_limit)
+        if not wait and username:
+            wait = self.store.take(f"user:{username}", *self.username_limit)
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, please retry later",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+def _make_store():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteBucketStore(RATE_LIMIT_SQLITE_PATH)
+    if RATE_LIMIT_BACKEND != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {RATE_LIMIT_BACKEND}")
+    return MemoryBucketStore()
+
+rate_limiter = RateLimiter(_make_store())
+
+def client_ip(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+async def submitted_username(request: Request) -> Optional[str]:
+    # FastAPI has already read and cached the body by the time dependencies run
+    username = request.query_params.get("username")
+    if username is None:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+            username = (await request.form()).get("username")
+        elif content_type.startswith("application/json"):
+            try:
+                body = await request.json()
+            except ValueError:
+                return None
+            if isinstance(body, dict):
+                username = body.get("username")
+    return username if isinstance(username, str) else None
+
+async def limit_login_attempts(request: Request):
+    """Dependency for credential endpoints: rejects floods before any password hashing."""
+    username = await submitted_username(request)
+    # The SQLite store can wait up to its busy timeout for the file lock, so
+    # the check runs on the threadpool rather than on the event loop
+    await run_in_threadpool(rate_limiter.check, client_ip(request), username)
@@ -0,0 +1,59 @@
+from sqlalchemy import event, text
+from sqlalchemy.pool import QueuePool
+from sqlmodel import create_engine
+import os
+
+# Echoing every statement is for local debugging only; use the slow-query log otherwise
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
+# WAL lets readers run alongside the single writer, and NORMAL only fsyncs at
+# checkpoints (a power cut can lose the last commits, never corrupt the file)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+# How long a writer waits for the lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Maps the file into the address space; the pages live in the OS page cache,
+# shared by every connection, rather than in each connection's heap
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Negative means KiB, so the default is an 8 MB page cache per connection,
+# at most 160 MB with the pool below full
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-8192"))
+# Sync endpoints run on Starlette's 40-thread pool, but SQLite has one writer and
+# reads mostly hit the mmap, so more connections than this only add memory.
+# Threads beyond it wait up to SQLITE_POOL_TIMEOUT for a free connection.
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "5"))
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "15"))
+SQLITE_POOL_TIMEOUT = float(os.getenv("SQLITE_POOL_TIMEOUT", "30"))
+
+def create_sqlite_engine(url: str, echo: bool = SQL_ECHO):
+    """Engine for a SQLite file with the pragmas and pooling above applied."""
+    engine = create_engine(
+        url,
+        echo=echo,
+        # Connections move between threads through the pool
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+        pool_timeout=SQLITE_POOL_TIMEOUT
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.close()
+
+    return engine
+
+def begin_immediate(session):
+    """Start session's transaction with BEGIN IMMEDIATE, taking SQLite's write lock up front.
+
+    The driver only begins a transaction at the first write, so the reads of a
+    read-modify-write can otherwise see a version another writer is replacing.
+    Call it before the session runs anything; other writers wait on busy_timeout.
+    """
+    session.execute(text("BEGIN IMMEDIATE"))
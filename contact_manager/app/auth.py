@@ -1,4 +1,5 @@
 from jose import JWTError, jwt
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
@@ -7,20 +8,45 @@ from sqlmodel import Session, select
 from typing import Optional
 from .database import get_session
 from .models import User, UserCreate, TokenData
+from common.principal_cache import invalidate_principal, principal_cache
+from common.password_hasher import BCRYPT_ROUNDS, PasswordHasher
+import asyncio
+import contextvars
+import os
 
 # Secret key and algorithm
 SECRET_KEY = "your-secret-key-here"  # Change this in production!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    # Pinning min and max to the configured factor makes verify_and_update
+    # return a fresh hash for passwords stored with any other factor
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+password_hasher = PasswordHasher(pwd_context)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# get_current_user runs on the event loop, so its (rare, cache-miss) user lookup
+# is handed to a small dedicated pool instead of blocking every in-flight request
+AUTH_DB_WORKERS = int(os.getenv("AUTH_DB_WORKERS", "4"))
+auth_db_executor = ThreadPoolExecutor(max_workers=AUTH_DB_WORKERS, thread_name_prefix="auth-db")
+
+def load_user(session: Session, username: str):
+    return session.exec(select(User).where(User.username == username)).first()
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password, hashed_password):
+    return password_hasher.verify_and_update(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -32,6 +58,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_subject(authorization: str) -> Optional[str]:
+    """Username of a valid bearer token, which scopes Idempotency-Keys; None otherwise."""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
 async def get_current_user(token: str = Depends(oauth2_scheme), 
                           session: Session = Depends(get_session)):
     credentials_exception = HTTPException(
@@ -48,9 +84,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme),
     except JWTError:
         raise credentials_exception
     
-    user = session.exec(select(User).where(User.username == token_data.username)).first()
+    # Tokens for recently seen users are answered without a user lookup
+    cached = principal_cache.get(token_data.username)
+    if cached is not None:
+        return User(**cached)
+    
+    # Run in a copy of this context so the request's query counter sees the lookup
+    context = contextvars.copy_context()
+    user = await asyncio.get_running_loop().run_in_executor(
+        auth_db_executor, context.run, load_user, session, token_data.username
+    )
     if user is None:
         raise credentials_exception
+    principal_cache.put(token_data.username, user.dict(exclude={"hashed_password"}), payload.get("exp"))
     return user
 
 def create_user(user: UserCreate, session: Session):
@@ -63,4 +109,5 @@ def create_user(user: UserCreate, session: Session):
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
+    invalidate_principal(db_user.username)
     return db_user
\ No newline at end of file
@@ -1,14 +1,21 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import SQLModel, Session
+from common.sqlite_engine import create_sqlite_engine
+from common.query_log import install_query_log
 from typing import Generator
 
 # SQLite database URL
 DATABASE_URL = "sqlite:///./contacts.db"
 
 # Create engine
-engine = create_engine(DATABASE_URL, echo=True)
+engine = create_sqlite_engine(DATABASE_URL)
+install_query_log(engine)
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist; add indexes declared since then
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 def get_session() -> Generator[Session, None, None]:
     with Session(engine) as session:
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select
 from typing import List
@@ -6,11 +6,19 @@ from datetime import datetime
 
 from . import models, database, auth, middleware
 from .database import get_session, create_db_and_tables
-from .auth import get_current_user, create_user, create_access_token, get_password_hash
+from .auth import get_current_user, create_user, create_access_token, get_password_hash, token_subject
 from .models import Contact, ContactCreate, ContactUpdate, UserCreate, Token
+from common.idempotency import IdempotencyMiddleware, IdempotencyStore
+from common.principal_cache import invalidate_principal
+from common.rate_limit import limit_login_attempts
+from common.query_log import QueryCountMiddleware, query_budget, query_stats, route_query_stats
+from common.query_audit import audit_query_plans, check_query_plans, require_query_audit_endpoint
 
 app = FastAPI(title="Contact Manager API")
 
+# Added first so it sits closest to the routes: X-DB-Queries counts the endpoint's own statements
+app.add_middleware(QueryCountMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +28,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Retried creates carrying an Idempotency-Key get the stored response
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=["/contacts/", "/register"],
+    store=IdempotencyStore(database.engine),
+    subject=token_subject
+)
+
 # Add custom middleware for IP logging
 app.middleware("http")(middleware.log_middleware)
 
@@ -27,7 +43,12 @@ app.middleware("http")(middleware.log_middleware)
 def on_startup():
     create_db_and_tables()
 
-@app.post("/register", response_model=Token)
+@app.on_event("shutdown")
+def on_shutdown():
+    # Logs scans an index would fix; fails the run under QUERY_AUDIT_STRICT
+    check_query_plans(database.engine, query_stats.examples())
+
+@app.post("/register", response_model=Token, dependencies=[Depends(query_budget(3))])
 def register(user: UserCreate, session: Session = Depends(get_session)):
     # Check if user already exists
     existing_user = session.exec(select(models.User).where(
@@ -50,19 +71,28 @@ def register(user: UserCreate, session: Session = Depends(get_session)):
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.post("/token", response_model=Token)
+# Three statements when the stored hash is upgraded: select, update, reload
+@app.post("/token", response_model=Token, dependencies=[Depends(query_budget(3)), Depends(limit_login_attempts)])
 def login_for_access_token(user: UserCreate, session: Session = Depends(get_session)):
     # Authenticate user
     db_user = session.exec(select(models.User).where(
         models.User.username == user.username
     )).first()
     
-    if not db_user or not auth.verify_password(user.password, db_user.hashed_password):
+    verified, new_hash = auth.verify_and_update_password(user.password, db_user.hashed_password) \
+        if db_user else (False, None)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored with an older work factor; upgrade it while we have the plain password
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        session.commit()
+        invalidate_principal(user.username)
     
     # Create access token
     access_token = create_access_token(
@@ -71,7 +101,30 @@ def login_for_access_token(user: UserCreate, session: Session = Depends(get_sess
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.post("/contacts/", response_model=Contact)
+@app.get("/metrics/hashing")
+def password_hashing_metrics(current_user: models.User = Depends(get_current_user)):
+    return auth.password_hasher.stats()
+
+@app.get("/metrics/queries")
+def query_metrics(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("total", pattern="^(total|p95|max|count)$"),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Most expensive statement shapes seen by this worker
+    return query_stats.top(limit, sort)
+
+@app.get("/metrics/requests")
+def request_query_metrics(current_user: models.User = Depends(get_current_user)):
+    # Statements and DB time per request for each route, heaviest first
+    return route_query_stats.summary()
+
+@app.get("/metrics/query-plans", dependencies=[Depends(require_query_audit_endpoint)])
+def query_plan_audit(current_user: models.User = Depends(get_current_user)):
+    # Statements seen by this worker whose plan scans a whole table, with index suggestions
+    return audit_query_plans(database.engine, query_stats.examples())
+
+@app.post("/contacts/", response_model=Contact, dependencies=[Depends(query_budget(4))])
 def create_contact(
     contact: ContactCreate,
     current_user: models.User = Depends(get_current_user),
@@ -100,7 +153,7 @@ def create_contact(
     session.refresh(db_contact)
     return db_contact
 
-@app.get("/contacts/", response_model=List[Contact])
+@app.get("/contacts/", response_model=List[Contact], dependencies=[Depends(query_budget(2))])
 def read_contacts(
     skip: int = 0,
     limit: int = 100,
@@ -1,6 +1,8 @@
-from sqlmodel import SQLModel, Field, Relationship
-from typing import Optional
+from sqlmodel import SQLModel, Field, Relationship, Index
+from typing import List, Optional
 from datetime import datetime
+# Imported so create_all makes its table; see common.idempotency
+from common.idempotency import IdempotencyRecord  # noqa: F401
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -8,8 +10,13 @@ class User(SQLModel, table=True):
     email: str = Field(unique=True)
     hashed_password: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    contacts: List["Contact"] = Relationship(back_populates="user")
 
 class Contact(SQLModel, table=True):
+    # Serves both the per-user listing and the per-user duplicate email check
+    __table_args__ = (Index("ix_contact_user_id_email", "user_id", "email"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
     email: str = Field(index=True)
@@ -20,8 +27,6 @@ class Contact(SQLModel, table=True):
     
     user: User = Relationship(back_populates="contacts")
 
-User.contacts = Relationship(back_populates="user")
-
 class ContactCreate(SQLModel):
     name: str
     email: str
@@ -42,4 +47,4 @@ class Token(SQLModel):
     token_type: str
 
 class TokenData(SQLModel):
-    username: Optional[str] = None
\ No newline at end of file
+    username: Optional[str] = None
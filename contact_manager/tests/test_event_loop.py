@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.main import app
+from app.database import engine
+from app.models import User
+from app.auth import create_access_token
+from app import auth
+from common.principal_cache import principal_cache
+import threading
+import time
+
+SLOW_LOOKUP_SECONDS = 1.0
+
+def test_slow_user_lookup_does_not_stall_other_requests(monkeypatch):
+    with TestClient(app) as client:
+        with Session(engine) as session:
+            session.add(User(username="slowpoke", email="slowpoke@example.com", hashed_password="unused"))
+            session.commit()
+        principal_cache.clear()
+        token = create_access_token({"sub": "slowpoke"})
+
+        load_user = auth.load_user
+
+        def slow_load_user(session, username):
+            time.sleep(SLOW_LOOKUP_SECONDS)
+            return load_user(session, username)
+
+        monkeypatch.setattr(auth, "load_user", slow_load_user)
+
+        responses = []
+        authenticated = threading.Thread(target=lambda: responses.append(
+            client.get("/contacts/", headers={"Authorization": f"Bearer {token}"})
+        ))
+        authenticated.start()
+        time.sleep(0.1)
+
+        # No user lookup and no database work
+        started = time.perf_counter()
+        assert client.get("/openapi.json").status_code == 200
+        elapsed = time.perf_counter() - started
+        authenticated.join()
+
+    assert responses[0].status_code == 200
+    assert elapsed < SLOW_LOOKUP_SECONDS / 4
@@ -1,7 +1,11 @@
-from sqlmodel import SQLModel, Field, create_engine, Session
+from sqlmodel import SQLModel, Field, Session
+from common.sqlite_engine import create_sqlite_engine
+from common.query_log import install_query_log
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 import json
+# Imported so create_all makes its table; see common.idempotency
+from common.idempotency import IdempotencyRecord  # noqa: F401
 
 class Product(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -16,18 +20,62 @@ class User(SQLModel, table=True):
     password: str
     is_admin: bool = Field(default=False)
 
-class CartItem(SQLModel):
+class CartItem(SQLModel, table=True):
+    # One row per cart line; the composite key makes add-to-cart a single upsert
+    user_id: int = Field(primary_key=True)
+    product_id: int = Field(primary_key=True)
+    quantity: int
+
+class Order(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(index=True)
+    username: str
+    total_amount: float
+    created_at: datetime = Field(default_factory=datetime.now, index=True)
+
+class OrderItem(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    order_id: int = Field(foreign_key="order.id", index=True)
     product_id: int
+    product_name: str
     quantity: int
+    price: float
+    total: float
+
+# Rollups maintained incrementally by utils/analytics.py as orders are placed
+class DailyRevenue(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    orders: int = Field(default=0)
+    units: int = Field(default=0)
+    revenue: float = Field(default=0)
+
+class HourlyRevenue(SQLModel, table=True):
+    hour: datetime = Field(primary_key=True)
+    orders: int = Field(default=0)
+    units: int = Field(default=0)
+    revenue: float = Field(default=0)
+
+class ProductSales(SQLModel, table=True):
+    product_id: int = Field(primary_key=True)
+    product_name: str
+    units: int = Field(default=0, index=True)
+    revenue: float = Field(default=0, index=True)
+
+# A single row, bumped in the same transaction as every write that changes product
+# listings, so all workers agree on when the catalog changed. See utils.catalog
+class CatalogVersion(SQLModel, table=True):
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0)
 
 # SQLite database
 sqlite_file_name = "database.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
-engine = create_engine(sqlite_url, echo=True)
+engine = create_sqlite_engine(sqlite_url)
+install_query_log(engine)
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
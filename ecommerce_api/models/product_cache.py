@@ -0,0 +1,174 @@
+from sqlalchemy import select as sa_select
+from sqlmodel import Session, select
+from models.database import Product
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, NamedTuple, Optional
+import threading
+import time
+import os
+
+# Name and price almost never change, so they are kept much longer than stock,
+# which checkout changes constantly (and other workers change without telling us).
+PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "10000"))
+PRODUCT_CACHE_INFO_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_INFO_TTL_SECONDS", "300"))
+PRODUCT_CACHE_STOCK_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_STOCK_TTL_SECONDS", "2"))
+PRODUCT_CACHE_MAX_PAGES = int(os.getenv("PRODUCT_CACHE_MAX_PAGES", "256"))
+
+class CachedProduct(NamedTuple):
+    id: int
+    name: str
+    price: float
+    stock: int
+
+class CacheCounters:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+class ProductCache:
+    """Bounded LRU + TTL cache of products and of GET /products/ pages."""
+
+    def __init__(self, max_entries: int, info_ttl: float, stock_ttl: float, max_pages: int):
+        self.max_entries = max_entries
+        self.info_ttl = info_ttl
+        self.stock_ttl = stock_ttl
+        self.max_pages = max_pages
+        # product id -> (expires_at, name, price)
+        self._info: "OrderedDict[int, tuple]" = OrderedDict()
+        # product id -> (expires_at, stock)
+        self._stock: Dict[int, tuple] = {}
+        # page key -> (expires_at, rows)
+        self._pages: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.products = CacheCounters()
+        # Lookups whose name and price were cached but whose stock had expired
+        self.stock_misses = 0
+        self.pages = CacheCounters()
+        self._lock = threading.Lock()
+
+    def _store(self, product: Any, now: float):
+        self._info[product.id] = (now + self.info_ttl, product.name, product.price)
+        self._info.move_to_end(product.id)
+        self._stock[product.id] = (now + self.stock_ttl, product.stock)
+        while len(self._info) > self.max_entries:
+            evicted_id, _ = self._info.popitem(last=False)
+            self._stock.pop(evicted_id, None)
+            self.products.evictions += 1
+
+    def get(self, session: Session, product_id: int) -> Optional[CachedProduct]:
+        return self.get_many(session, [product_id]).get(product_id)
+
+    def get_many(self, session: Session, product_ids: Iterable[int]) -> Dict[int, CachedProduct]:
+        """Return cached products, reading whatever is missing with a single IN (...) query.
+
+        When only stock has expired, only the stock column is re-read.
+        """
+        found: Dict[int, CachedProduct] = {}
+        missing: List[int] = []
+        # product id -> cached (expires_at, name, price) whose stock needs reading
+        stale_stock: Dict[int, tuple] = {}
+        now = time.monotonic()
+        with self._lock:
+            for product_id in product_ids:
+                info = self._info.get(product_id)
+                if info is None or info[0] < now:
+                    missing.append(product_id)
+                    self.products.misses += 1
+                    continue
+                self._info.move_to_end(product_id)
+                stock = self._stock.get(product_id)
+                if stock is None or stock[0] < now:
+                    stale_stock[product_id] = info
+                    self.stock_misses += 1
+                    continue
+                found[product_id] = CachedProduct(product_id, info[1], info[2], stock[1])
+                self.products.hits += 1
+
+        if missing:
+            # Whole rows are being read anyway, so the stale stock rides along
+            products = session.exec(select(Product).where(Product.id.in_(missing + list(stale_stock)))).all()
+            self.put_many(products)
+            for product in products:
+                found[product.id] = CachedProduct(product.id, product.name, product.price, product.stock)
+        elif stale_stock:
+            table = Product.__table__
+            rows = session.execute(
+                sa_select(table.c.id, table.c.stock).where(table.c.id.in_(list(stale_stock)))
+            ).all()
+            self._put_stock(rows, stale_stock)
+            for product_id, stock in rows:
+                _, name, price = stale_stock[product_id]
+                found[product_id] = CachedProduct(product_id, name, price, stock)
+        return found
+
+    def _put_stock(self, rows: Iterable[Any], stale_stock: Dict[int, tuple]):
+        now = time.monotonic()
+        with self._lock:
+            for product_id, stock in rows:
+                # Evicted while the stock was being read: leave it out
+                if product_id in self._info:
+                    self._stock[product_id] = (now + self.stock_ttl, stock)
+            # Deleted since their name and price were cached
+            for product_id in set(stale_stock) - {row[0] for row in rows}:
+                self._info.pop(product_id, None)
+
+    def put_many(self, products: Iterable[Any]):
+        now = time.monotonic()
+        with self._lock:
+            for product in products:
+                self._store(product, now)
+
+    def get_page(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.pages.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.pages.hits += 1
+            return entry[1]
+
+    def put_page(self, key: Hashable, rows: List[Dict[str, Any]]):
+        # Pages include stock, so they expire on the stock TTL
+        with self._lock:
+            self._pages[key] = (time.monotonic() + self.stock_ttl, rows)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+                self.pages.evictions += 1
+
+    def invalidate(self, product_ids: Optional[Iterable[int]] = None):
+        """Drop the given products (or everything) along with all cached pages."""
+        with self._lock:
+            if product_ids is None:
+                self._info.clear()
+                self._stock.clear()
+            else:
+                for product_id in product_ids:
+                    self._info.pop(product_id, None)
+                    self._stock.pop(product_id, None)
+            self._pages.clear()
+
+    def invalidate_stock(self, product_ids: Iterable[int]):
+        # Name and price stay cached; only the stock (and pages showing it) is dropped
+        with self._lock:
+            for product_id in product_ids:
+                self._stock.pop(product_id, None)
+            self._pages.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "products": dict(self.products.as_dict(), stock_misses=self.stock_misses, size=len(self._info)),
+                "pages": dict(self.pages.as_dict(), size=len(self._pages))
+            }
+
+product_cache = ProductCache(
+    PRODUCT_CACHE_MAX_ENTRIES,
+    PRODUCT_CACHE_INFO_TTL_SECONDS,
+    PRODUCT_CACHE_STOCK_TTL_SECONDS,
+    PRODUCT_CACHE_MAX_PAGES
+)
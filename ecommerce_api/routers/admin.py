@@ -1,11 +1,45 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from sqlmodel import Session, select
-from models.database import Product, get_session
-from utils.auth import get_current_admin
-from typing import Any
+from models.database import Product, engine, get_session
+from models.product_cache import product_cache
+from common.query_log import query_stats, route_query_stats
+from common.query_audit import audit_query_plans, require_query_audit_endpoint
+from utils.auth import get_current_admin, password_hasher
+from utils.catalog import bump_catalog_version
+from utils.product_import import import_products, read_csv_rows, read_ndjson_rows
+from utils import analytics
+from typing import Any, Optional
+from datetime import date, datetime, timedelta
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+@router.get("/cache/stats")
+def product_cache_stats(admin: Any = Depends(get_current_admin)):
+    return product_cache.stats()
+
+@router.get("/metrics/hashing")
+def password_hashing_metrics(admin: Any = Depends(get_current_admin)):
+    return password_hasher.stats()
+
+@router.get("/metrics/queries")
+def query_metrics(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("total", pattern="^(total|p95|max|count)$"),
+    admin: Any = Depends(get_current_admin)
+):
+    # Most expensive statement shapes seen by this worker
+    return query_stats.top(limit, sort)
+
+@router.get("/metrics/requests")
+def request_query_metrics(admin: Any = Depends(get_current_admin)):
+    # Statements and DB time per request for each route, heaviest first
+    return route_query_stats.summary()
+
+@router.get("/metrics/query-plans", dependencies=[Depends(require_query_audit_endpoint)])
+def query_plan_audit(admin: Any = Depends(get_current_admin)):
+    # Statements seen by this worker whose plan scans a whole table, with index suggestions
+    return audit_query_plans(engine, query_stats.examples())
+
 @router.post("/products/")
 def create_product_admin(
     name: str, 
@@ -16,6 +50,59 @@ def create_product_admin(
 ):
     product = Product(name=name, price=price, stock=stock)
     session.add(product)
+    bump_catalog_version(session)
     session.commit()
     session.refresh(product)
-    return product
\ No newline at end of file
+    product_cache.invalidate([product.id])
+    return product
+
+@router.post("/products/import")
+def import_products_admin(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    session: Session = Depends(get_session),
+    admin: Any = Depends(get_current_admin)
+):
+    # Rows are parsed from the spooled upload one at a time, never loaded as a whole
+    file_format = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+    if file_format == "csv":
+        rows = read_csv_rows(file.file)
+    elif file_format == "ndjson":
+        rows = read_ndjson_rows(file.file)
+    else:
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    
+    return import_products(session, rows)
+
+
+# Dashboard endpoints read only the rollup tables, never the orders themselves
+@router.get("/stats/daily")
+def daily_stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    session: Session = Depends(get_session),
+    admin: Any = Depends(get_current_admin)
+):
+    end = end or date.today()
+    start = start or end - timedelta(days=30)
+    return analytics.daily_revenue(session, start, end)
+
+@router.get("/stats/hourly")
+def hourly_stats(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    session: Session = Depends(get_session),
+    admin: Any = Depends(get_current_admin)
+):
+    end = end or datetime.now()
+    start = start or end - timedelta(hours=48)
+    return analytics.hourly_revenue(session, start, end)
+
+@router.get("/stats/top-products")
+def top_products_stats(
+    limit: int = Query(10, ge=1, le=100),
+    by: str = Query("units", pattern="^(units|revenue)$"),
+    session: Session = Depends(get_session),
+    admin: Any = Depends(get_current_admin)
+):
+    return analytics.top_products(session, limit=limit, by=by)
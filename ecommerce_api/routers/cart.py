@@ -1,114 +1,61 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from models.database import Product, get_session
+from sqlmodel import Session
+from models.database import get_session
+from models.product_cache import product_cache
+from common.query_log import query_budget
 from utils.auth import get_current_user
-from typing import Any, Dict, List
-from datetime import datetime
-import json
+from utils.checkout import CheckoutError, place_order
+from utils.cart_store import add_item, cart_to_list, get_cart, invalidate_cart
+from utils.flash_sale import flash_stock
+from typing import Any
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 
-# In-memory cart storage (in production, use database)
-user_carts: Dict[int, List[Dict]] = {}
-
-@router.post("/add")
+@router.post("/add", dependencies=[Depends(query_budget(5))])
 def add_to_cart(
     product_id: int, 
     quantity: int, 
     current_user: Any = Depends(get_current_user),  # Changed from User to Any
     session: Session = Depends(get_session)
 ):
-    # Get product
-    product = session.get(Product, product_id)
+    # Get product (name/price/stock usually come from the product cache)
+    product = product_cache.get(session, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    if product.stock < quantity:
+    # Flash-sale stock is partly leased into this worker's memory
+    stock = flash_stock.available(product_id, product.stock) if flash_stock.is_flash(product_id) else product.stock
+    if stock < quantity:
         raise HTTPException(status_code=400, detail="Insufficient stock")
     
-    # Initialize user cart if not exists
-    if current_user.id not in user_carts:
-        user_carts[current_user.id] = []
-    
-    # Check if product already in cart
-    cart = user_carts[current_user.id]
-    for item in cart:
-        if item["product_id"] == product_id:
-            item["quantity"] += quantity
-            break
-    else:
-        cart.append({"product_id": product_id, "quantity": quantity})
+    # Insert the line or add to its quantity
+    add_item(session, current_user.id, product_id, quantity)
+    cart = get_cart(session, current_user.id)
     
-    return {"message": "Product added to cart", "cart": cart}
+    return {"message": "Product added to cart", "cart": cart_to_list(cart)}
 
 @router.post("/checkout")
 def checkout(
     current_user: Any = Depends(get_current_user),  # Changed from User to Any
     session: Session = Depends(get_session)
 ):
-    if current_user.id not in user_carts or not user_carts[current_user.id]:
+    # Always read the cart table here, never the per-worker cache
+    cart = get_cart(session, current_user.id, use_cache=False)
+    if not cart:
         raise HTTPException(status_code=400, detail="Cart is empty")
     
-    cart = user_carts[current_user.id]
-    total_amount = 0
-    order_items = []
-    
-    # Process each item in cart
-    for item in cart:
-        product = session.get(Product, item["product_id"])
-        if not product:
-            continue
-        
-        if product.stock < item["quantity"]:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Insufficient stock for {product.name}"
-            )
-        
-        # Update stock
-        product.stock -= item["quantity"]
-        session.add(product)
-        
-        # Calculate total
-        item_total = product.price * item["quantity"]
-        total_amount += item_total
-        
-        order_items.append({
-            "product_id": product.id,
-            "product_name": product.name,
-            "quantity": item["quantity"],
-            "price": product.price,
-            "total": item_total
-        })
-    
-    # Create order
-    order = {
-        "user_id": current_user.id,
-        "username": current_user.username,
-        "items": order_items,
-        "total_amount": total_amount,
-        "timestamp": str(datetime.now())
-    }
-    
-    # Save to orders.json
     try:
-        with open("orders.json", "r") as f:
-            orders = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        orders = []
-    
-    orders.append(order)
-    
-    with open("orders.json", "w") as f:
-        json.dump(orders, f, indent=2)
+        order = place_order(session, current_user, cart)
+    except CheckoutError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Insufficient stock", "failed_items": e.failed_items}
+        )
     
-    # Clear cart
-    user_carts[current_user.id] = []
-    
-    session.commit()
+    invalidate_cart(current_user.id)
     
     return {
         "message": "Order placed successfully",
         "order": order,
-        "total_amount": total_amount
-    }
\ No newline at end of file
+        "total_amount": order["total_amount"]
+    }
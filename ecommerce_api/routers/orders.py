@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+from models.database import get_session
+from utils.auth import get_current_user
+from utils.orders import get_order, get_orders_for_user
+from common.query_log import query_budget
+from typing import Any
+
+router = APIRouter(prefix="/orders", tags=["orders"])
+
+@router.get("/", dependencies=[Depends(query_budget(3))])
+def list_orders(
+    skip: int = 0,
+    limit: int = 50,
+    current_user: Any = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    return get_orders_for_user(session, current_user.id, skip=skip, limit=limit)
+
+@router.get("/{order_id}", dependencies=[Depends(query_budget(3))])
+def read_order(
+    order_id: int,
+    current_user: Any = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    order = get_order(session, order_id)
+    if not order or (order["user_id"] != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
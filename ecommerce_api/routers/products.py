@@ -1,16 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select as sa_select
+from sqlmodel import Session
 from models.database import Product, get_session
+from models.product_cache import product_cache
+from common.query_log import query_budget
 from utils.auth import get_current_admin
-from typing import Any
+from utils.catalog import bump_catalog_version, catalog_etag, catalog_version, etag_matches
+from utils.search_index import product_index
+from typing import Any, Optional
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-@router.get("/")
-def get_products(session: Session = Depends(get_session)):
-    products = session.exec(select(Product)).all()
+PRODUCT_FIELDS = ("id", "name", "price", "stock")
+
+def parse_fields(fields: Optional[str]):
+    if not fields:
+        return PRODUCT_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(PRODUCT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # id is always returned because it is the pagination cursor
+    return tuple(field for field in PRODUCT_FIELDS if field in requested or field == "id")
+
+# The page, plus the shared catalog version when this worker's copy is over a second old
+@router.get("/", dependencies=[Depends(query_budget(2))])
+def get_products(
+    request: Request,
+    response: Response,
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session)
+):
+    columns = parse_fields(fields)
+
+    # Answer revalidation from the catalog version alone, without reading any products
+    version = catalog_version()
+    etag = catalog_etag(version, after_id, limit, columns)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    page_key = (version, after_id, limit, columns)
+    products = product_cache.get_page(page_key)
+    if products is None:
+        table = Product.__table__
+        statement = sa_select(*[table.c[column] for column in columns]).order_by(table.c.id).limit(limit)
+        if after_id is not None:
+            statement = statement.where(table.c.id > after_id)
+        products = [dict(row._mapping) for row in session.execute(statement)]
+        product_cache.put_page(page_key, products)
+
+    response.headers["ETag"] = etag
+    if len(products) == limit:
+        response.headers["X-Next-Cursor"] = str(products[-1]["id"])
     return products
 
+# A rebuild reads the products, plus the shared catalog version when it is due
+@router.get("/search", dependencies=[Depends(query_budget(2))])
+def search_products(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+    session: Session = Depends(get_session)
+):
+    # Served from the in-memory prefix index; the DB is only read when the catalog changed
+    product_index.ensure_current(session)
+    return product_index.search(q, limit=limit, min_price=min_price, max_price=max_price, in_stock=in_stock)
+
 @router.post("/")
 def create_product(
     name: str, 
@@ -21,6 +80,8 @@ def create_product(
 ):
     product = Product(name=name, price=price, stock=stock)
     session.add(product)
+    bump_catalog_version(session)
     session.commit()
     session.refresh(product)
-    return product
\ No newline at end of file
+    product_cache.invalidate([product.id])
+    return product
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
 from models.database import User, get_session
-from utils.auth import get_password_hash, create_access_token, verify_password
+from utils.auth import get_password_hash, create_access_token, verify_and_update_password
+from common.principal_cache import invalidate_principal
+from common.rate_limit import limit_login_attempts
+from common.query_log import query_budget
 from datetime import timedelta
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-@router.post("/register")
+@router.post("/register", dependencies=[Depends(query_budget(4))])
 def register_user(username: str, email: str, password: str, session: Session = Depends(get_session)):
     # Check if user exists
     existing_user = session.exec(select(User).where(User.username == username)).first()
@@ -22,18 +25,27 @@ def register_user(username: str, email: str, password: str, session: Session = D
     session.add(user)
     session.commit()
     session.refresh(user)
+    invalidate_principal(user.username)
     
     return {"message": "User created successfully"}
 
-@router.post("/token")
+# Three statements when the stored hash is upgraded: select, update, reload
+@router.post("/token", dependencies=[Depends(query_budget(3)), Depends(limit_login_attempts)])
 def login_for_access_token(username: str, password: str, session: Session = Depends(get_session)):
     user = session.exec(select(User).where(User.username == username)).first()
-    if not user or not verify_password(password, user.password):
+    verified, new_hash = verify_and_update_password(password, user.password) if user else (False, None)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored with an older work factor; upgrade it while we have the plain password
+        user.password = new_hash
+        session.add(user)
+        session.commit()
+        invalidate_principal(username)
     
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Cheap hashes for the tests; the app reads this when it is imported
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+# The app opens database.db and orders.json relative to the working directory
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.chdir(tempfile.mkdtemp(prefix="ecommerce-api-tests-"))
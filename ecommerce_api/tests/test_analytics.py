@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+from datetime import datetime
+from sqlmodel import Session, select
+from models.database import DailyRevenue, HourlyRevenue, ProductSales, create_db_and_tables, engine
+from utils.analytics import backfill, record_order
+from utils.orders import create_order
+
+def rollups(session: Session):
+    return (
+        [(row.day, row.orders, row.units, row.revenue) for row in session.exec(select(DailyRevenue).order_by(DailyRevenue.day))],
+        [(row.hour, row.orders, row.units, row.revenue) for row in session.exec(select(HourlyRevenue).order_by(HourlyRevenue.hour))],
+        [(row.product_id, row.product_name, row.units, row.revenue) for row in session.exec(select(ProductSales).order_by(ProductSales.product_id))],
+    )
+
+def test_backfill_matches_the_incremental_rollups():
+    create_db_and_tables()
+    buyer = SimpleNamespace(id=4242, username="analyst")
+    orders = [
+        (datetime(2002, 5, 6, 9, 15), [(901, "Desk", 1, 120.5)]),
+        (datetime(2002, 5, 6, 9, 59, 59, 999999), [(901, "Desk", 2, 120.5), (902, "Lamp", 3, 8.25)]),
+        (datetime(2002, 5, 6, 10, 0), [(902, "Lamp", 1, 8.25)]),
+        (datetime(2002, 5, 7, 23, 30), [(903, "Chair", 4, 45.0)]),
+        (datetime(2002, 5, 8, 0, 0), []),
+    ]
+    with Session(engine) as session:
+        # Start from rollups that agree with whatever earlier tests left in the tables
+        backfill(session)
+        for created_at, lines in orders:
+            items = [
+                {"product_id": pid, "product_name": name, "quantity": quantity, "price": price, "total": price * quantity}
+                for pid, name, quantity, price in lines
+            ]
+            create_order(session, buyer, items, sum(item["total"] for item in items), created_at=created_at)
+            record_order(session, created_at, items)
+        session.commit()
+        incremental = rollups(session)
+
+        counts = backfill(session)
+        session.expire_all()
+        assert rollups(session) == incremental
+        assert counts == {"days": len(incremental[0]), "hours": len(incremental[1]), "products": len(incremental[2])}
+
+        # Orders placed after a backfill must land on the backfilled rows, not beside them
+        later = datetime(2002, 5, 6, 9, 30)
+        record_order(session, later, [{"product_id": 902, "product_name": "Lamp", "quantity": 1, "price": 8.25, "total": 8.25}])
+        session.commit()
+        hours = session.exec(select(HourlyRevenue).where(HourlyRevenue.hour == datetime(2002, 5, 6, 9))).all()
+        days = session.exec(select(DailyRevenue).where(DailyRevenue.day == later.date())).all()
+        assert [(row.orders, row.units) for row in hours] == [(3, 7)]
+        assert [(row.orders, row.units) for row in days] == [(4, 8)]
@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+from passlib.hash import bcrypt
+from sqlmodel import Session, select
+from main import app
+from models.database import User, create_db_and_tables, engine
+from utils.auth import create_access_token
+from common.principal_cache import principal_cache
+
+def test_upgrading_a_stored_hash_drops_the_cached_principal():
+    create_db_and_tables()
+    with Session(engine) as session:
+        # Hashed with a higher work factor than the tests' BCRYPT_ROUNDS, so login rehashes it
+        session.add(User(username="rehash", email="rehash@example.com", password=bcrypt.using(rounds=5).hash("secret")))
+        session.commit()
+
+    with TestClient(app) as client:
+        token = create_access_token({"sub": "rehash"})
+        assert client.get("/orders/", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+        assert principal_cache.get("rehash") is not None
+
+        response = client.post("/users/token", params={"username": "rehash", "password": "secret"})
+        assert response.status_code == 200
+        assert principal_cache.get("rehash") is None
+        with Session(engine) as session:
+            user = session.exec(select(User).where(User.username == "rehash")).one()
+            assert user.password.startswith("$2b$04$")
@@ -0,0 +1,57 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from main import app
+from models.database import CartItem, Product, User, create_db_and_tables, engine
+from utils.auth import create_access_token
+from utils.cart_store import add_item, cart_cache, get_cart
+import pytest
+
+@pytest.fixture
+def session():
+    create_db_and_tables()
+    with Session(engine) as session:
+        yield session
+
+def cart_rows(session: Session, user_id: int):
+    session.expire_all()
+    return {item.product_id: item.quantity for item in session.exec(select(CartItem).where(CartItem.user_id == user_id))}
+
+def test_adding_a_product_twice_updates_one_line(session):
+    add_item(session, 501, 1, 2)
+    add_item(session, 501, 1, 3)
+    add_item(session, 501, 2, 1)
+    assert cart_rows(session, 501) == {1: 5, 2: 1}
+
+def test_writes_go_through_to_a_cached_cart(session):
+    add_item(session, 502, 1, 1)
+    assert get_cart(session, 502) == {1: 1}
+
+    # Changed behind the cache's back, so reads that still see 1 come from the cache
+    session.execute(CartItem.__table__.update().where(CartItem.user_id == 502).values(quantity=9))
+    session.commit()
+    assert get_cart(session, 502) == {1: 1}
+
+    # The write is applied to the cached entry rather than dropping it
+    add_item(session, 502, 1, 2)
+    assert get_cart(session, 502) == {1: 3}
+    assert get_cart(session, 502, use_cache=False) == {1: 11}
+
+def test_checkout_empties_the_table_and_the_cache():
+    with TestClient(app) as client:
+        with Session(engine) as session:
+            user = User(username="shopper", email="shopper@example.com", password="unused")
+            product = Product(name="Cart test", price=2.0, stock=10)
+            session.add_all([user, product])
+            session.commit()
+            user_id, product_id = user.id, product.id
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'shopper'})}"}
+
+        response = client.post("/cart/add", params={"product_id": product_id, "quantity": 2}, headers=headers)
+        assert response.status_code == 200
+        assert cart_cache.get(user_id) == {product_id: 2}
+
+        assert client.post("/cart/checkout", headers=headers).status_code == 200
+        assert cart_cache.get(user_id) is None
+        with Session(engine) as session:
+            assert cart_rows(session, user_id) == {}
+        assert client.post("/cart/checkout", headers=headers).json()["detail"] == "Cart is empty"
@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session
+from main import app
+from models.database import engine
+from utils import catalog
+from utils.catalog import bump_catalog_version
+import time
+
+TTL = 0.2
+
+def other_worker_writes():
+    # Another process bumps the row; this worker's cached copy is not told
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO catalogversion (id, version) VALUES (1, 1) "
+            "ON CONFLICT (id) DO UPDATE SET version = version + 1"
+        ))
+
+def test_another_workers_write_ends_304s_within_the_ttl(monkeypatch):
+    monkeypatch.setattr(catalog, "CATALOG_VERSION_TTL_SECONDS", TTL)
+    with TestClient(app) as client:
+        etag = client.get("/products/").headers["etag"]
+        assert client.get("/products/", headers={"If-None-Match": etag}).status_code == 304
+
+        other_worker_writes()
+        time.sleep(TTL * 1.5)
+        response = client.get("/products/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+def test_own_write_is_seen_on_the_next_request(monkeypatch):
+    monkeypatch.setattr(catalog, "CATALOG_VERSION_TTL_SECONDS", 60)
+    with TestClient(app) as client:
+        etag = client.get("/products/").headers["etag"]
+        with Session(engine) as session:
+            bump_catalog_version(session)
+            session.commit()
+        assert client.get("/products/", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from sqlmodel import Session
+from models.database import Product, create_db_and_tables, engine
+from utils.checkout import CheckoutError, place_order
+import threading
+
+def test_concurrent_checkouts_never_oversell():
+    create_db_and_tables()
+    with Session(engine) as session:
+        product = Product(name="Last units", price=3.0, stock=50)
+        session.add(product)
+        session.commit()
+        product_id = product.id
+
+    buyers = 300
+    start = threading.Barrier(buyers)
+
+    def checkout(user_id: int) -> str:
+        user = SimpleNamespace(id=100000 + user_id, username=f"buyer{user_id}")
+        start.wait()
+        with Session(engine) as session:
+            try:
+                place_order(session, user, {product_id: 1})
+            except CheckoutError as e:
+                # Whatever a rejection reports as available must be true at that point
+                assert e.failed_items[0]["available"] < 1
+                return "rejected"
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=buyers) as executor:
+        results = list(executor.map(checkout, range(buyers)))
+
+    assert results.count("ok") == 50
+    assert results.count("rejected") == 250
+    with Session(engine) as session:
+        assert session.get(Product, product_id).stock == 0
@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from main import app
+from models.database import User, engine
+from utils import auth
+from utils.auth import create_access_token
+from common.principal_cache import principal_cache
+import threading
+import time
+
+SLOW_LOOKUP_SECONDS = 1.0
+
+def test_slow_user_lookup_does_not_stall_other_requests(monkeypatch):
+    with TestClient(app) as client:
+        with Session(engine) as session:
+            session.add(User(username="slowpoke", email="slowpoke@example.com", password="unused"))
+            session.commit()
+        principal_cache.clear()
+        token = create_access_token({"sub": "slowpoke"})
+
+        load_user = auth.load_user
+
+        def slow_load_user(session, username):
+            time.sleep(SLOW_LOOKUP_SECONDS)
+            return load_user(session, username)
+
+        monkeypatch.setattr(auth, "load_user", slow_load_user)
+
+        responses = []
+        authenticated = threading.Thread(target=lambda: responses.append(
+            client.get("/orders/", headers={"Authorization": f"Bearer {token}"})
+        ))
+        authenticated.start()
+        time.sleep(0.1)
+
+        started = time.perf_counter()
+        assert client.get("/").status_code == 200
+        elapsed = time.perf_counter() - started
+        authenticated.join()
+
+    assert responses[0].status_code == 200
+    assert elapsed < SLOW_LOOKUP_SECONDS / 4
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlmodel import Session
+from models.database import Product, create_db_and_tables, engine
+from utils.flash_sale import FlashSaleStock
+import pytest
+
+@pytest.fixture
+def product_id():
+    create_db_and_tables()
+    with Session(engine) as session:
+        product = Product(name="Flash", price=1.0, stock=50)
+        session.add(product)
+        session.commit()
+        return product.id
+
+def stock(product_id: int) -> int:
+    with Session(engine) as session:
+        return session.get(Product, product_id).stock
+
+def test_workers_sharing_a_product_never_oversell(product_id):
+    # Two workers, each with its own counters, leasing from the same row
+    workers = [FlashSaleStock([product_id], lease_size=7, stripes=4) for _ in range(2)]
+
+    def buy(attempt: int) -> bool:
+        return not workers[attempt % 2].reserve({product_id: 1})
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        sold = sum(executor.map(buy, range(300)))
+
+    assert sold == 50
+    assert stock(product_id) == 0
+    assert sum(worker.leased(product_id) for worker in workers) == 0
+
+def test_reservation_larger_than_a_lease_is_leased_in_full(product_id):
+    worker = FlashSaleStock([product_id], lease_size=7, stripes=4)
+    assert worker.reserve({product_id: 30}) == []
+    assert worker.leased(product_id) == 0
+    assert stock(product_id) == 20
+    # More than is left anywhere: refused, and the rest stays leasable
+    assert worker.reserve({product_id: 21}) == [product_id]
+    assert worker.leased(product_id) + stock(product_id) == 20
+
+def test_unsold_leases_go_back_to_the_table(product_id):
+    worker = FlashSaleStock([product_id], lease_size=7, stripes=4)
+    assert worker.reserve({product_id: 1}) == []
+    assert stock(product_id) == 43
+    worker.release({product_id: 1})
+    worker.return_leases()
+    assert stock(product_id) == 50
+    assert worker.leased(product_id) == 0
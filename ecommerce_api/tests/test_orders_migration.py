@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from sqlmodel import Session, select
+from models.database import DailyRevenue, Order, create_db_and_tables, engine
+from utils.orders import migrate_orders_json
+import json
+import os
+
+LEGACY_DAY = date(2001, 2, 3)
+
+def test_only_one_worker_imports_and_the_rollups_include_it(tmp_path):
+    create_db_and_tables()
+    path = str(tmp_path / "orders.json")
+    legacy = [
+        {
+            "user_id": 1,
+            "username": "legacy",
+            "items": [{"product_id": 1, "product_name": "Laptop", "quantity": quantity, "price": 2.0, "total": 2.0 * quantity}],
+            "total_amount": 2.0 * quantity,
+            "timestamp": f"{LEGACY_DAY.isoformat()} 10:00:00"
+        }
+        for quantity in (1, 3)
+    ]
+    with open(path, "w") as f:
+        json.dump(legacy, f)
+
+    # Every worker runs the migration on startup
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        migrated = list(executor.map(lambda _: migrate_orders_json(path), range(8)))
+
+    assert sorted(migrated) == [0] * 7 + [2]
+    assert os.path.exists(path + ".migrated")
+    assert not os.path.exists(path)
+    with Session(engine) as session:
+        assert len(session.exec(select(Order).where(Order.username == "legacy")).all()) == 2
+        rollup = session.get(DailyRevenue, LEGACY_DAY)
+        assert (rollup.orders, rollup.units, rollup.revenue) == (2, 4, 8.0)
+
+def test_unreadable_file_is_left_in_place(tmp_path):
+    path = str(tmp_path / "orders.json")
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert migrate_orders_json(path) == 0
+    assert os.path.exists(path)
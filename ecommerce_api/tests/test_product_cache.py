@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+from sqlalchemy import event
+from sqlmodel import Session
+from models.database import Product, create_db_and_tables, engine
+from models.product_cache import ProductCache, product_cache
+from utils.checkout import place_order
+from utils.product_import import import_products
+import pytest
+
+@pytest.fixture
+def session():
+    create_db_and_tables()
+    with Session(engine) as session:
+        yield session
+
+def add_products(session: Session, count: int, stock: int = 10):
+    products = [Product(name=f"Cached {i}", price=1.0, stock=stock) for i in range(count)]
+    session.add_all(products)
+    session.commit()
+    return [product.id for product in products]
+
+@contextmanager
+def statements():
+    seen = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(" ".join(statement.split()))
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+def test_hits_misses_and_evictions_are_counted(session):
+    first, second, third = add_products(session, 3)
+    cache = ProductCache(max_entries=2, info_ttl=300, stock_ttl=300, max_pages=4)
+
+    assert set(cache.get_many(session, [first, second])) == {first, second}
+    assert cache.get(session, first).name == "Cached 0"
+    # Loading a third product evicts the least recently used one, second
+    cache.get(session, third)
+    cache.get(session, second)
+
+    assert cache.stats()["products"] == {"hits": 1, "misses": 4, "evictions": 2, "stock_misses": 0, "size": 2}
+
+def test_expired_stock_alone_rereads_only_stock(session):
+    product_id, other_id = add_products(session, 2)
+    cache = ProductCache(max_entries=10, info_ttl=300, stock_ttl=0, max_pages=4)
+    cache.get_many(session, [product_id, other_id])
+
+    session.execute(Product.__table__.update().where(Product.id == product_id).values(stock=3))
+    session.commit()
+    with statements() as seen:
+        products = cache.get_many(session, [product_id, other_id])
+
+    assert products[product_id].stock == 3 and products[product_id].name == "Cached 0"
+    assert len(seen) == 1
+    assert seen[0].startswith("SELECT product.id, product.stock FROM product")
+    assert cache.stats()["products"]["stock_misses"] == 2
+
+def test_checkout_invalidates_the_stock_it_took(session):
+    product_id, = add_products(session, 1)
+    assert product_cache.get(session, product_id).stock == 10
+
+    place_order(session, SimpleNamespace(id=901, username="cache-buyer"), {product_id: 4})
+
+    with statements() as seen:
+        assert product_cache.get(session, product_id).stock == 6
+    # Name and price were still cached; only the stock was read
+    assert seen[0].startswith("SELECT product.id, product.stock FROM product")
+
+def test_import_invalidates_every_product(session):
+    product_id, = add_products(session, 1)
+    product_cache.get(session, product_id)
+
+    import_products(session, iter([(2, {"name": "Cached 0", "price": "7.5", "stock": "1"})]))
+
+    cached = product_cache.get(session, product_id)
+    assert (cached.price, cached.stock) == (7.5, 1)
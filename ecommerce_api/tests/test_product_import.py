@@ -0,0 +1,38 @@
+from fastapi import HTTPException
+from sqlmodel import Session, select
+from models.database import Product, create_db_and_tables, engine
+from utils.catalog import catalog_version
+from utils.product_import import import_products, read_csv_rows, read_ndjson_rows
+import io
+import pytest
+
+@pytest.fixture
+def session():
+    create_db_and_tables()
+    with Session(engine) as session:
+        yield session
+
+def names(session: Session):
+    return set(session.exec(select(Product.name).where(Product.name.startswith("Import "))))
+
+def test_undecodable_line_is_reported_after_the_rows_before_it(session):
+    body = b"name,price,stock\nImport A,1,1\nImport B,x,1\nImport \xff,1,1\nImport C,1,1\n"
+    version = catalog_version()
+
+    with pytest.raises(HTTPException) as raised:
+        import_products(session, read_csv_rows(io.BytesIO(body)))
+
+    assert raised.value.status_code == 400
+    assert raised.value.detail["line"] == 4
+    assert raised.value.detail["imported"] == 1
+    assert raised.value.detail["failed"] == 1
+    assert names(session) == {"Import A"}
+    # What did commit is visible to cached readers
+    assert catalog_version() != version
+
+def test_ndjson_decode_error_names_the_line(session):
+    body = b'{"name": "Import D", "price": 1, "stock": 1}\n\n{"name": "\xe9"}\n'
+    with pytest.raises(HTTPException) as raised:
+        import_products(session, read_ndjson_rows(io.BytesIO(body)))
+    assert raised.value.detail["line"] == 3
+    assert raised.value.detail["imported"] == 1
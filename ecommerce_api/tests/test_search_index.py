@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+from sqlalchemy import text
+from sqlmodel import Session
+from models.database import Product, create_db_and_tables, engine
+from utils import catalog, search_index
+from utils.flash_sale import FlashSaleStock
+from utils.search_index import MAX_RANKED_MATCHES, ProductSearchIndex
+import time
+
+def product(product_id: int, name: str, price: float, stock: int = 1):
+    return SimpleNamespace(id=product_id, name=name, price=price, stock=stock)
+
+def test_filtered_match_behind_many_cheap_prefix_matches_is_found():
+    index = ProductSearchIndex()
+    index.build(
+        [product(i, f"Apple {i}", 5.0) for i in range(1, 1001)]
+        + [product(1001, "Azure Lamp", 500.0)]
+    )
+    assert [match["name"] for match in index.search("a", min_price=100)] == ["Azure Lamp"]
+
+def test_unfiltered_short_prefix_stops_after_enough_matches():
+    index = ProductSearchIndex()
+    index.build([product(i, f"Apple {i}", 5.0) for i in range(1, 1001)])
+    matches = index.search("a", limit=MAX_RANKED_MATCHES + 50)
+    assert len(matches) == MAX_RANKED_MATCHES
+
+def test_write_through_another_session_is_searchable_once_the_version_moves(monkeypatch):
+    monkeypatch.setattr(catalog, "CATALOG_VERSION_TTL_SECONDS", 0.1)
+    create_db_and_tables()
+    with Session(engine) as session:
+        sold_out = Product(name="Quokka Mug", price=4.0, stock=3)
+        session.add(sold_out)
+        session.commit()
+        index = ProductSearchIndex()
+        index.ensure_current(session)
+        assert [match["name"] for match in index.search("quokka", in_stock=True)] == ["Quokka Mug"]
+
+        # Another worker adds a product and sells out this one; only the shared row tells us
+        with engine.begin() as connection:
+            connection.execute(Product.__table__.insert().values(name="Quokka Lamp", price=9.0, stock=2))
+            connection.execute(Product.__table__.update().where(Product.id == sold_out.id).values(stock=0))
+            connection.execute(text(
+                "INSERT INTO catalogversion (id, version) VALUES (1, 1) "
+                "ON CONFLICT(id) DO UPDATE SET version = version + 1"
+            ))
+        time.sleep(0.15)
+
+        index.ensure_current(session)
+        assert [match["name"] for match in index.search("quokka", in_stock=True)] == ["Quokka Lamp"]
+
+def test_flash_sale_stock_matches_what_checkout_can_sell(monkeypatch):
+    create_db_and_tables()
+    with Session(engine) as session:
+        flash = Product(name="Wombat Kettle", price=20.0, stock=10)
+        session.add(flash)
+        session.commit()
+        stock = FlashSaleStock([flash.id], lease_size=5, stripes=4)
+        monkeypatch.setattr(search_index, "flash_stock", stock)
+
+        # Leases 5 out of the table and sells 1 of them
+        assert stock.reserve({flash.id: 1}) == []
+        index = ProductSearchIndex()
+        index.ensure_current(session)
+        assert index.search("wombat")[0]["stock"] == 9
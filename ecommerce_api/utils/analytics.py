@@ -0,0 +1,110 @@
+from sqlalchemy import delete, func, insert, select as sa_select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from models.database import DailyRevenue, HourlyRevenue, Order, OrderItem, ProductSales, engine
+from typing import Any, Dict, List
+from datetime import date, datetime
+
+def _increment(session: Session, model: Any, key: Dict[str, Any], values: Dict[str, Any], counters: List[str]):
+    # INSERT the row or add to its counters in a single statement
+    table = model.__table__
+    statement = sqlite_insert(table).values(**key, **values)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={
+            column: (table.c[column] + statement.excluded[column]) if column in counters else statement.excluded[column]
+            for column in values
+        }
+    )
+    session.execute(statement)
+
+def record_order(session: Session, created_at: datetime, items: List[Dict[str, Any]]):
+    """Fold one order into the rollups; runs inside the checkout transaction."""
+    units = sum(item["quantity"] for item in items)
+    revenue = sum(item["total"] for item in items)
+    totals = {"orders": 1, "units": units, "revenue": revenue}
+    counters = ["orders", "units", "revenue"]
+
+    _increment(session, DailyRevenue, {"day": created_at.date()}, totals, counters)
+    _increment(session, HourlyRevenue, {"hour": created_at.replace(minute=0, second=0, microsecond=0)}, totals, counters)
+    for item in items:
+        _increment(
+            session,
+            ProductSales,
+            {"product_id": item["product_id"]},
+            {"product_name": item["product_name"], "units": item["quantity"], "revenue": item["total"]},
+            ["units", "revenue"]
+        )
+
+def daily_revenue(session: Session, start: date, end: date) -> List[DailyRevenue]:
+    return session.exec(
+        select(DailyRevenue)
+        .where(DailyRevenue.day >= start, DailyRevenue.day <= end)
+        .order_by(DailyRevenue.day)
+    ).all()
+
+def hourly_revenue(session: Session, start: datetime, end: datetime) -> List[HourlyRevenue]:
+    return session.exec(
+        select(HourlyRevenue)
+        .where(HourlyRevenue.hour >= start, HourlyRevenue.hour <= end)
+        .order_by(HourlyRevenue.hour)
+    ).all()
+
+def top_products(session: Session, limit: int = 10, by: str = "units") -> List[ProductSales]:
+    column = ProductSales.revenue if by == "revenue" else ProductSales.units
+    return session.exec(select(ProductSales).order_by(column.desc()).limit(limit)).all()
+
+def backfill(session: Session) -> Dict[str, int]:
+    """Rebuild every rollup from the order tables (one pass, grouped in SQL)."""
+    for model in (DailyRevenue, HourlyRevenue, ProductSales):
+        session.execute(delete(model.__table__))
+
+    order_units = (
+        sa_select(OrderItem.order_id, func.sum(OrderItem.quantity).label("units"))
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    orders = Order.__table__.outerjoin(order_units, order_units.c.order_id == Order.id)
+    buckets = {
+        DailyRevenue: func.date(Order.created_at),
+        # The text SQLAlchemy stores for a DateTime, so keys match record_order's
+        HourlyRevenue: func.strftime("%Y-%m-%d %H:00:00.000000", Order.created_at),
+    }
+    counts = {}
+    for model, bucket in buckets.items():
+        table = model.__table__
+        result = session.execute(insert(table).from_select(
+            [table.primary_key.columns.values()[0].name, "orders", "units", "revenue"],
+            sa_select(
+                bucket,
+                func.count(Order.id),
+                func.sum(func.coalesce(order_units.c.units, 0)),
+                func.sum(Order.total_amount)
+            ).select_from(orders).group_by(bucket)
+        ))
+        counts[model] = result.rowcount
+
+    table = ProductSales.__table__
+    result = session.execute(insert(table).from_select(
+        ["product_id", "product_name", "units", "revenue"],
+        sa_select(
+            OrderItem.product_id,
+            func.max(OrderItem.product_name),
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.total)
+        ).group_by(OrderItem.product_id)
+    ))
+    counts[ProductSales] = result.rowcount
+    session.commit()
+
+    return {"days": counts[DailyRevenue], "hours": counts[HourlyRevenue], "products": counts[ProductSales]}
+
+if __name__ == "__main__":
+    import sys
+    from models.database import create_db_and_tables
+
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("usage: python -m utils.analytics backfill")
+    create_db_and_tables()
+    with Session(engine) as session:
+        print(backfill(session))
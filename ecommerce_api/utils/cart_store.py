@@ -0,0 +1,92 @@
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from models.database import CartItem
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import threading
+import time
+import os
+
+# Each worker keeps a small read-through cache of recently used carts. Writes go
+# straight to the cart table and are applied to the local entry; other workers
+# pick them up within CART_CACHE_TTL_SECONDS at worst. Checkout always reads the table.
+CART_CACHE_TTL_SECONDS = float(os.getenv("CART_CACHE_TTL_SECONDS", "5"))
+CART_CACHE_MAX_USERS = int(os.getenv("CART_CACHE_MAX_USERS", "10000"))
+
+class CartCache:
+    def __init__(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[float, Dict[int, int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, lines = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return dict(lines)
+
+    def put(self, user_id: int, lines: Dict[int, int]):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(lines))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def add(self, user_id: int, product_id: int, quantity: int):
+        # Write-through for a cached cart so the next read stays a cache hit
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry[1][product_id] = entry[1].get(product_id, 0) + quantity
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+cart_cache = CartCache(CART_CACHE_MAX_USERS, CART_CACHE_TTL_SECONDS)
+
+def get_cart(session: Session, user_id: int, use_cache: bool = True) -> Dict[int, int]:
+    """Return the user's cart as {product_id: quantity}."""
+    if use_cache:
+        lines = cart_cache.get(user_id)
+        if lines is not None:
+            return lines
+
+    items = session.exec(select(CartItem).where(CartItem.user_id == user_id)).all()
+    lines = {item.product_id: item.quantity for item in items}
+    cart_cache.put(user_id, lines)
+    return lines
+
+def add_item(session: Session, user_id: int, product_id: int, quantity: int):
+    # Insert the line or bump its quantity in one statement, keyed by (user_id, product_id)
+    statement = sqlite_insert(CartItem.__table__).values(
+        user_id=user_id, product_id=product_id, quantity=quantity
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "product_id"],
+        set_={"quantity": CartItem.__table__.c.quantity + statement.excluded.quantity}
+    )
+    session.execute(statement)
+    session.commit()
+    cart_cache.add(user_id, product_id, quantity)
+
+def clear_cart(session: Session, user_id: int):
+    # Runs inside the caller's transaction; call invalidate_cart() after committing
+    session.execute(delete(CartItem.__table__).where(CartItem.__table__.c.user_id == user_id))
+
+def invalidate_cart(user_id: int):
+    cart_cache.invalidate(user_id)
+
+def cart_to_list(lines: Dict[int, int]) -> List[Dict[str, int]]:
+    return [
+        {"product_id": product_id, "quantity": quantity}
+        for product_id, quantity in lines.items()
+    ]
@@ -0,0 +1,56 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+from models.database import CatalogVersion, engine
+from typing import Any
+import hashlib
+import threading
+import time
+import os
+
+# The version lives in the catalogversion table, shared by every worker. Each
+# worker re-reads it at most this often, so after a write made by another
+# worker a stale 304 (or cached page) is served for at most this long.
+CATALOG_VERSION_TTL_SECONDS = float(os.getenv("CATALOG_VERSION_TTL_SECONDS", "1"))
+
+_version = 0
+_expires_at = 0.0
+_lock = threading.Lock()
+
+def catalog_version() -> int:
+    global _version, _expires_at
+    if time.monotonic() < _expires_at:
+        return _version
+    with _lock:
+        # Threads that waited here use the value the first one read
+        if time.monotonic() >= _expires_at:
+            with Session(engine) as session:
+                version = session.execute(
+                    select(CatalogVersion.version).where(CatalogVersion.id == 1)
+                ).scalar()
+            _version = version or 0
+            _expires_at = time.monotonic() + CATALOG_VERSION_TTL_SECONDS
+        return _version
+
+def bump_catalog_version(session: Session):
+    """Bump the shared version inside the caller's transaction; the caller commits.
+
+    Call it just before the commit: this worker re-reads the version on its next
+    request, and a read between the two would keep the old one for a TTL.
+    """
+    global _expires_at
+    table = CatalogVersion.__table__
+    statement = sqlite_insert(table).values(id=1, version=1)
+    session.execute(statement.on_conflict_do_update(index_elements=["id"], set_={"version": table.c.version + 1}))
+    _expires_at = 0.0
+
+def catalog_etag(version: int, *parts: Any) -> str:
+    # The same catalog version and request give the same ETag on every worker
+    digest = hashlib.sha1(f"{version}:{parts!r}".encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,121 @@
+from sqlalchemy import update
+from sqlmodel import Session, select
+from models.database import Product
+from models.product_cache import product_cache
+from utils.cart_store import clear_cart
+from utils.catalog import bump_catalog_version
+from utils.flash_sale import flash_stock
+from utils.analytics import record_order
+from utils.orders import create_order
+from typing import Any, Dict, List
+from datetime import datetime
+
+class CheckoutError(Exception):
+    def __init__(self, failed_items: List[Dict[str, Any]]):
+        super().__init__("Insufficient stock")
+        self.failed_items = failed_items
+
+def place_order(session: Session, user: Any, cart: Dict[int, int]) -> Dict[str, Any]:
+    """Decrement stock for every cart line, record the order and empty the cart.
+
+    Everything is committed in one transaction. Raises CheckoutError listing the
+    lines that could not be fulfilled; in that case nothing is written.
+    """
+    # Load every product in the cart with a single IN (...) query
+    products = session.exec(select(Product).where(Product.id.in_(list(cart)))).all()
+    products_by_id = {product.id: product for product in products}
+
+    # Products that no longer exist are dropped from the order, as before
+    lines = [
+        (products_by_id[product_id], quantity)
+        for product_id, quantity in cart.items()
+        if product_id in products_by_id
+    ]
+    flash_lines = {
+        product.id: quantity for product, quantity in lines
+        if flash_stock.is_flash(product.id)
+    }
+
+    failed_items = [
+        _failed_item(product, quantity, _available(product))
+        for product, quantity in lines
+        if _available(product) < quantity
+    ]
+    if failed_items:
+        raise CheckoutError(failed_items)
+
+    # Flash-sale products are taken from the in-memory counters, all or nothing
+    failed_ids = flash_stock.reserve(flash_lines) if flash_lines else []
+    if failed_ids:
+        raise CheckoutError([
+            _failed_item(
+                products_by_id[product_id],
+                flash_lines[product_id],
+                flash_stock.available(product_id, _current_stock(session, product_id))
+            )
+            for product_id in failed_ids
+        ])
+
+    try:
+        # The stock check above is only advisory; the guarded UPDATE is what
+        # prevents two concurrent checkouts from both taking the last units
+        for product, quantity in lines:
+            if product.id in flash_lines:
+                continue
+            result = session.execute(
+                update(Product)
+                .where(Product.id == product.id, Product.stock >= quantity)
+                .values(stock=Product.stock - quantity)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                # product.stock is from before another checkout took the units
+                failed_items.append(_failed_item(product, quantity, _current_stock(session, product.id)))
+
+        if failed_items:
+            raise CheckoutError(failed_items)
+
+        order_items = []
+        total_amount = 0
+        for product, quantity in lines:
+            item_total = product.price * quantity
+            total_amount += item_total
+            order_items.append({
+                "product_id": product.id,
+                "product_name": product.name,
+                "quantity": quantity,
+                "price": product.price,
+                "total": item_total
+            })
+
+        created_at = datetime.now()
+        order = create_order(session, user, order_items, total_amount, created_at=created_at)
+        record_order(session, created_at, order_items)
+        clear_cart(session, user.id)
+        # Stock changed, so cached product listings are no longer valid
+        bump_catalog_version(session)
+        session.commit()
+        product_cache.invalidate_stock(cart)
+    except Exception:
+        session.rollback()
+        if flash_lines:
+            flash_stock.release(flash_lines)
+        raise
+
+    return order
+
+def _available(product: Product) -> int:
+    if flash_stock.is_flash(product.id):
+        return flash_stock.available(product.id, product.stock)
+    return product.stock
+
+def _current_stock(session: Session, product_id: int) -> int:
+    return session.execute(select(Product.stock).where(Product.id == product_id)).scalar() or 0
+
+def _failed_item(product: Product, quantity: int, available: int) -> Dict[str, Any]:
+    return {
+        "product_id": product.id,
+        "product_name": product.name,
+        "requested": quantity,
+        "available": available
+    }
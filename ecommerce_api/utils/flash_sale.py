@@ -0,0 +1,155 @@
+from sqlalchemy import update
+from sqlmodel import Session, select
+from models.database import Product, engine
+from models.product_cache import product_cache
+from utils.catalog import bump_catalog_version
+from typing import Dict, Iterable, List
+import threading
+import os
+
+# Opt-in: comma separated product ids whose stock is sold from in-memory leases during a sale
+FLASH_SALE_PRODUCT_IDS = os.getenv("FLASH_SALE_PRODUCT_IDS", "")
+# Units a worker takes out of the product table at a time. A crashed worker's
+# unsold lease is lost, so a crash can undersell by at most this per product.
+FLASH_SALE_LEASE_SIZE = int(os.getenv("FLASH_SALE_LEASE_SIZE", "50"))
+FLASH_SALE_LOCK_STRIPES = int(os.getenv("FLASH_SALE_LOCK_STRIPES", "16"))
+
+class FlashSaleStock:
+    """Lock-striped in-process stock counters, filled by leasing stock from the product table.
+
+    A lease moves units out of product.stock with a guarded UPDATE, so the table
+    always holds exactly the stock no worker has leased. Reservations only ever
+    draw on this worker's leases: any number of workers can sell the same
+    product without overselling, and nothing sold needs writing back.
+    """
+
+    def __init__(self, product_ids: Iterable[int], lease_size: int, stripes: int):
+        self.product_ids = frozenset(product_ids)
+        self.lease_size = max(lease_size, 1)
+        self._locks = [threading.Lock() for _ in range(max(stripes, 1))]
+        # Leased units not yet sold, by product
+        self._leased: Dict[int, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.product_ids)
+
+    def is_flash(self, product_id: int) -> bool:
+        return product_id in self.product_ids
+
+    def _lock_for(self, product_id: int) -> threading.Lock:
+        return self._locks[product_id % len(self._locks)]
+
+    def _locks_for(self, product_ids: Iterable[int]) -> List[threading.Lock]:
+        # Always acquire stripes in index order so multi-product reservations cannot deadlock
+        stripes = sorted({product_id % len(self._locks) for product_id in product_ids})
+        return [self._locks[stripe] for stripe in stripes]
+
+    def leased(self, product_id: int) -> int:
+        with self._lock_for(product_id):
+            return self._leased.get(product_id, 0)
+
+    def available(self, product_id: int, unleased: int) -> int:
+        # What this worker could sell: its lease plus what it could still lease
+        return self.leased(product_id) + unleased
+
+    def _lease(self, wanted: Dict[int, int]) -> Dict[int, int]:
+        """Take up to wanted units per product out of the table, in one transaction.
+
+        Returns the units granted. The caller holds the products' stripe locks.
+        """
+        table = Product.__table__
+        granted = {}
+        with Session(engine) as session:
+            for product_id, quantity in wanted.items():
+                result = session.execute(
+                    update(table)
+                    .where(table.c.id == product_id, table.c.stock >= quantity)
+                    .values(stock=table.c.stock - quantity)
+                )
+                if result.rowcount == 1:
+                    granted[product_id] = quantity
+                    continue
+                # Less than a full lease is left. The UPDATE above took the write
+                # lock, so the stock read here cannot change before the commit.
+                remaining = session.execute(select(table.c.stock).where(table.c.id == product_id)).scalar()
+                if remaining:
+                    session.execute(update(table).where(table.c.id == product_id).values(stock=0))
+                    granted[product_id] = remaining
+            if granted:
+                bump_catalog_version(session)
+            session.commit()
+
+        for product_id, quantity in granted.items():
+            self._leased[product_id] = self._leased.get(product_id, 0) + quantity
+        if granted:
+            product_cache.invalidate_stock(granted)
+        return granted
+
+    def reserve(self, lines: Dict[int, int]) -> List[int]:
+        """Take stock for every line or for none; returns the product ids that fell short.
+
+        Leases are topped up first when they cannot cover a line, so the units
+        handed out never exceed what was taken out of the table.
+        """
+        locks = self._locks_for(lines)
+        for lock in locks:
+            lock.acquire()
+        try:
+            shortfalls = {
+                product_id: quantity - self._leased.get(product_id, 0)
+                for product_id, quantity in lines.items()
+                if self._leased.get(product_id, 0) < quantity
+            }
+            if shortfalls:
+                self._lease({
+                    product_id: max(shortfall, self.lease_size)
+                    for product_id, shortfall in shortfalls.items()
+                })
+
+            failed = [
+                product_id for product_id, quantity in lines.items()
+                if self._leased.get(product_id, 0) < quantity
+            ]
+            if not failed:
+                for product_id, quantity in lines.items():
+                    self._leased[product_id] -= quantity
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        return failed
+
+    def release(self, lines: Dict[int, int]):
+        # Units of a failed checkout go back to the lease, not to the table
+        for product_id, quantity in lines.items():
+            with self._lock_for(product_id):
+                self._leased[product_id] = self._leased.get(product_id, 0) + quantity
+
+    def return_leases(self):
+        """Put every unsold leased unit back into the product table (on shutdown)."""
+        locks = self._locks_for(self.product_ids)
+        for lock in locks:
+            lock.acquire()
+        try:
+            returned = {product_id: quantity for product_id, quantity in self._leased.items() if quantity}
+            if not returned:
+                return
+            table = Product.__table__
+            with Session(engine) as session:
+                for product_id, quantity in returned.items():
+                    session.execute(
+                        update(table).where(table.c.id == product_id).values(stock=table.c.stock + quantity)
+                    )
+                bump_catalog_version(session)
+                session.commit()
+            self._leased.clear()
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        product_cache.invalidate_stock(returned)
+
+flash_stock = FlashSaleStock(
+    (int(product_id) for product_id in FLASH_SALE_PRODUCT_IDS.split(",") if product_id.strip()),
+    FLASH_SALE_LEASE_SIZE,
+    FLASH_SALE_LOCK_STRIPES
+)
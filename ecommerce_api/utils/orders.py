@@ -0,0 +1,145 @@
+from sqlmodel import Session, select
+from models.database import Order, OrderItem, engine
+from utils.analytics import record_order
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import json
+import os
+
+LEGACY_ORDERS_FILE = "orders.json"
+
+def create_order(
+    session: Session,
+    user: Any,
+    items: List[Dict],
+    total_amount: float,
+    created_at: Optional[datetime] = None
+) -> Dict[str, Any]:
+    # One INSERT for the order plus one per line; nothing else is read or rewritten
+    order = Order(
+        user_id=user.id,
+        username=user.username,
+        total_amount=total_amount,
+        created_at=created_at or datetime.now()
+    )
+    session.add(order)
+    session.flush()
+
+    order_items = [OrderItem(order_id=order.id, **item) for item in items]
+    session.add_all(order_items)
+    return order_to_dict(order, order_items)
+
+def order_to_dict(order: Order, items: List[OrderItem]) -> Dict[str, Any]:
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "username": order.username,
+        "items": [
+            {
+                "product_id": item.product_id,
+                "product_name": item.product_name,
+                "quantity": item.quantity,
+                "price": item.price,
+                "total": item.total
+            }
+            for item in items
+        ],
+        "total_amount": order.total_amount,
+        "timestamp": str(order.created_at)
+    }
+
+def get_order(session: Session, order_id: int) -> Optional[Dict[str, Any]]:
+    order = session.get(Order, order_id)
+    if not order:
+        return None
+    items = session.exec(select(OrderItem).where(OrderItem.order_id == order.id)).all()
+    return order_to_dict(order, items)
+
+def get_orders_for_user(session: Session, user_id: int, skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+    orders = session.exec(
+        select(Order)
+        .where(Order.user_id == user_id)
+        .order_by(Order.id.desc())
+        .offset(skip)
+        .limit(limit)
+    ).all()
+    if not orders:
+        return []
+
+    # Fetch the lines for the whole page in a single query
+    items_by_order: Dict[int, List[OrderItem]] = {order.id: [] for order in orders}
+    items = session.exec(
+        select(OrderItem).where(OrderItem.order_id.in_(list(items_by_order)))
+    ).all()
+    for item in items:
+        items_by_order[item.order_id].append(item)
+
+    return [order_to_dict(order, items_by_order[order.id]) for order in orders]
+
+def migrate_orders_json(path: str = LEGACY_ORDERS_FILE) -> int:
+    """Import the legacy orders.json file once, rollups included, and move it out of the way.
+
+    Every worker calls this on startup. The file is claimed by renaming it, so
+    exactly one of them imports it. If that worker dies mid-import nothing is
+    committed and the file is left at orders.json.migrating; rename it back.
+    """
+    claimed = path + ".migrating"
+    try:
+        os.replace(path, claimed)
+    except FileNotFoundError:
+        # Already migrated, or another worker claimed it first
+        return 0
+
+    try:
+        with open(claimed, "r") as f:
+            legacy_orders = json.load(f)
+    except json.JSONDecodeError:
+        # Leave it where it was for someone to look at
+        os.replace(claimed, path)
+        return 0
+
+    try:
+        with Session(engine) as session:
+            for legacy in legacy_orders:
+                try:
+                    created_at = datetime.fromisoformat(legacy["timestamp"])
+                except (KeyError, ValueError):
+                    created_at = datetime.now()
+
+                order = Order(
+                    user_id=legacy["user_id"],
+                    username=legacy.get("username", ""),
+                    total_amount=legacy.get("total_amount", 0),
+                    created_at=created_at
+                )
+                session.add(order)
+                session.flush()
+
+                items = [
+                    {
+                        "product_id": item["product_id"],
+                        "product_name": item.get("product_name", ""),
+                        "quantity": item["quantity"],
+                        "price": item["price"],
+                        "total": item.get("total", item["price"] * item["quantity"])
+                    }
+                    for item in legacy.get("items", [])
+                ]
+                session.add_all(OrderItem(order_id=order.id, **item) for item in items)
+                record_order(session, created_at, items)
+            session.commit()
+    except Exception:
+        # Nothing was committed, so the next startup can try again
+        os.replace(claimed, path)
+        raise
+
+    # Rename rather than delete so the import is never repeated but stays auditable
+    os.replace(claimed, path + ".migrated")
+    return len(legacy_orders)
+
+if __name__ == "__main__":
+    from models.database import create_db_and_tables
+
+    create_db_and_tables()
+    migrated = migrate_orders_json()
+    print(f"Migrated {migrated} orders from {LEGACY_ORDERS_FILE}")
@@ -0,0 +1,158 @@
+from fastapi import HTTPException
+from sqlalchemy import bindparam, insert, select, update
+from sqlmodel import Session
+from models.database import Product
+from models.product_cache import product_cache
+from utils.catalog import bump_catalog_version
+from utils.search_index import product_index
+from typing import Any, Dict, IO, Iterator, List, Tuple
+import csv
+import json
+
+IMPORT_BATCH_SIZE = 1000
+# Batches written per transaction; a 50k-row file is committed in five transactions
+IMPORT_BATCHES_PER_COMMIT = 10
+MAX_REPORTED_ERRORS = 1000
+
+class RowError(ValueError):
+    pass
+
+class DecodeError(ValueError):
+    """A line that is not UTF-8. Nothing after it can be read, so the import stops there."""
+
+    def __init__(self, line_num: int, error: UnicodeDecodeError):
+        super().__init__(f"Line is not valid UTF-8: {error.reason} at byte {error.start}")
+        self.line_num = line_num
+
+def decode_lines(stream: IO[bytes]) -> Iterator[str]:
+    # Decoded a line at a time, so an error names the line it is on
+    for line_num, line in enumerate(stream, start=1):
+        try:
+            yield line.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise DecodeError(line_num, e)
+
+def read_csv_rows(stream: IO[bytes]) -> Iterator[Tuple[int, Any]]:
+    reader = csv.DictReader(decode_lines(stream))
+    for row in reader:
+        yield reader.line_num, row
+
+def read_ndjson_rows(stream: IO[bytes]) -> Iterator[Tuple[int, Any]]:
+    for line_num, line in enumerate(decode_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_num, RowError(f"Invalid JSON: {e.msg}")
+
+def validate_row(row: Any) -> Dict[str, Any]:
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("Row must be an object")
+
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise RowError("name is required")
+    try:
+        price = float(row.get("price"))
+        stock = int(row.get("stock"))
+    except (TypeError, ValueError):
+        raise RowError("price must be a number and stock an integer")
+    if price < 0 or stock < 0:
+        raise RowError("price and stock must not be negative")
+    return {"name": name, "price": price, "stock": stock}
+
+def _write_batch(session: Session, batch: Dict[str, Dict[str, Any]]) -> Tuple[int, int]:
+    table = Product.__table__
+    existing = set(session.execute(select(table.c.name).where(table.c.name.in_(list(batch)))).scalars())
+
+    updates = [
+        {"b_name": name, "b_price": row["price"], "b_stock": row["stock"]}
+        for name, row in batch.items() if name in existing
+    ]
+    inserts = [row for name, row in batch.items() if name not in existing]
+
+    if updates:
+        session.execute(
+            update(table)
+            .where(table.c.name == bindparam("b_name"))
+            .values(price=bindparam("b_price"), stock=bindparam("b_stock")),
+            updates
+        )
+    if inserts:
+        session.execute(insert(table), inserts)
+    return len(inserts), len(updates)
+
+def import_products(session: Session, rows: Iterator[Tuple[int, Any]]) -> Dict[str, Any]:
+    """Upsert products by name from (row number, row) pairs using executemany batches.
+
+    Invalid rows are counted and skipped. A line that is not UTF-8 ends the
+    import with a 400 saying where, after the rows before it are written.
+    """
+    created = updated = failed = 0
+    errors: List[Dict[str, Any]] = []
+    # Keyed by name so a name repeated within a batch is written once (last row wins)
+    batch: Dict[str, Dict[str, Any]] = {}
+    batches_in_transaction = 0
+
+    def commit():
+        # Each transaction bumps the catalog version along with the rows it writes
+        bump_catalog_version(session)
+        session.commit()
+
+    def flush_batch():
+        nonlocal created, updated, batches_in_transaction
+        inserted_count, updated_count = _write_batch(session, batch)
+        created += inserted_count
+        updated += updated_count
+        batch.clear()
+        batches_in_transaction += 1
+        if batches_in_transaction >= IMPORT_BATCHES_PER_COMMIT:
+            commit()
+            batches_in_transaction = 0
+
+    decode_error = None
+    try:
+        try:
+            for row_num, row in rows:
+                try:
+                    product = validate_row(row)
+                except RowError as e:
+                    failed += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({"row": row_num, "error": str(e)})
+                    continue
+
+                batch[product["name"]] = product
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    flush_batch()
+        except DecodeError as e:
+            # The rows before the undecodable line are still written
+            decode_error = e
+
+        if batch:
+            flush_batch()
+        commit()
+    finally:
+        # Invalidate every catalog cache once, not once per product. Earlier
+        # transactions may have committed even when a later one fails.
+        product_cache.invalidate()
+        product_index.invalidate()
+
+    if decode_error is not None:
+        raise HTTPException(status_code=400, detail={
+            "line": decode_error.line_num,
+            "imported": created + updated,
+            "failed": failed,
+            "error": str(decode_error)
+        })
+
+    return {
+        "created": created,
+        "updated": updated,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors)
+    }
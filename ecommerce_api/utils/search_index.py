@@ -0,0 +1,139 @@
+from sqlmodel import Session, select
+from models.database import Product
+from utils.catalog import catalog_version
+from utils.flash_sale import flash_stock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Very short prefixes ("a") can match most of the catalog; the walk stops once
+# this many products pass every filter, and only those are ranked
+MAX_RANKED_MATCHES = 300
+
+def normalize(text: str) -> str:
+    # Case-fold and strip accents so "Café" is found by "cafe"
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(normalize(text))
+
+class ProductSearchIndex:
+    """In-process prefix index over product names.
+
+    Every name token is kept in one sorted list of (token, product_id) pairs, so a
+    prefix lookup is two bisects plus a scan of just the matching slice. The index
+    is a snapshot of the product table at one catalog version, and is rebuilt
+    when any worker's write moves the version on.
+    """
+
+    def __init__(self):
+        self._tokens: List[Tuple[str, int]] = []
+        # product id -> (normalized name, display name, price, stock, tokens)
+        self._products: Dict[int, Tuple[str, str, float, int, Tuple[str, ...]]] = {}
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        # Held by the one thread rebuilding; searches keep using the old snapshot meanwhile
+        self._build_lock = threading.Lock()
+
+    def build(self, products: Iterable[Any], version: Optional[int] = None):
+        tokens = []
+        entries = {}
+        for product in products:
+            entries[product.id] = self._entry(product)
+            tokens.extend((token, product.id) for token in entries[product.id][4])
+        tokens.sort()
+        with self._lock:
+            self._tokens = tokens
+            self._products = entries
+            self._version = version
+
+    @staticmethod
+    def _entry(product: Any):
+        tokens = tuple(sorted(set(tokenize(product.name))))
+        return (normalize(product.name), product.name, product.price, product.stock, tokens)
+
+    def ensure_current(self, session: Session):
+        """Rebuild from the product table if the catalog changed since the last build.
+
+        catalog_version() is re-read at most once a second, which bounds how long
+        another worker's create, import or sale goes unseen.
+        """
+        version = catalog_version()
+        if self._version == version:
+            return
+        with self._build_lock:
+            if self._version != version:
+                # populate_existing: rows the caller's session already holds may predate the write
+                products = session.exec(select(Product).execution_options(populate_existing=True)).all()
+                self.build(products, version)
+
+    def invalidate(self):
+        # Forces a full rebuild on the next search, e.g. after a failed bulk import
+        with self._lock:
+            self._version = None
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect.bisect_left(self._tokens, (prefix,))
+        # "\uffff" sorts after any character that can follow the prefix
+        end = bisect.bisect_left(self._tokens, (prefix + "\uffff",), lo=start)
+        return start, end
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False
+    ) -> List[Dict[str, Any]]:
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+        normalized_query = normalize(query).strip()
+
+        with self._lock:
+            # Every query token must prefix some token of the name. Walk the index
+            # slice of the most selective token and check the others per product.
+            ranges = sorted((self._prefix_range(token) for token in query_tokens), key=lambda r: r[1] - r[0])
+            start, end = ranges[0]
+            other_tokens = query_tokens if len(query_tokens) > 1 else ()
+
+            # Filters apply during the walk, so a rare match deep in the slice is
+            # still found; a name with several matching tokens is checked once
+            seen = set()
+            ranked = []
+            for position in range(start, end):
+                product_id = self._tokens[position][1]
+                if product_id in seen:
+                    continue
+                seen.add(product_id)
+                normalized_name, name, price, stock, tokens = self._products[product_id]
+                if flash_stock.is_flash(product_id):
+                    # The table holds only what no worker has leased; add this worker's lease
+                    stock = flash_stock.available(product_id, stock)
+                if not all(any(token.startswith(q) for token in tokens) for q in other_tokens):
+                    continue
+                if min_price is not None and price < min_price:
+                    continue
+                if max_price is not None and price > max_price:
+                    continue
+                if in_stock and stock <= 0:
+                    continue
+                # Whole-name prefix matches first, then shorter names, then oldest products
+                rank = (0 if normalized_name.startswith(normalized_query) else 1, len(normalized_name), product_id)
+                ranked.append((rank, product_id, name, price, stock))
+                if len(ranked) >= MAX_RANKED_MATCHES:
+                    break
+
+        return [
+            {"id": product_id, "name": name, "price": price, "stock": stock}
+            for _, product_id, name, price, stock in heapq.nsmallest(limit, ranked)
+        ]
+
+product_index = ProductSearchIndex()
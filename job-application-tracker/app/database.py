@@ -1,4 +1,6 @@
 from sqlmodel import create_engine, Session, SQLModel
+from common.sqlite_engine import SQL_ECHO, create_sqlite_engine
+from common.query_log import install_query_log
 import os
 from dotenv import load_dotenv
 
@@ -6,11 +8,19 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./job_applications.db")
 
-engine = create_engine(DATABASE_URL, echo=True)
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_sqlite_engine(DATABASE_URL)
+else:
+    engine = create_engine(DATABASE_URL, echo=SQL_ECHO)
+install_query_log(engine)
 
 def get_session():
     with Session(engine) as session:
         yield session
 
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist; add indexes declared since then
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
\ No newline at end of file
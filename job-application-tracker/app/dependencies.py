@@ -3,7 +3,12 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, select
 from app.database import get_session
 from app.models import User
+from common.principal_cache import principal_cache
 from jose import JWTError, jwt
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import asyncio
+import contextvars
 import os
 from dotenv import load_dotenv
 
@@ -14,6 +19,14 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# get_current_user runs on the event loop, so its (rare, cache-miss) user lookup
+# is handed to a small dedicated pool instead of blocking every in-flight request
+AUTH_DB_WORKERS = int(os.getenv("AUTH_DB_WORKERS", "4"))
+auth_db_executor = ThreadPoolExecutor(max_workers=AUTH_DB_WORKERS, thread_name_prefix="auth-db")
+
+def load_user(session: Session, username: str):
+    return session.exec(select(User).where(User.username == username)).first()
+
 def check_user_agent(user_agent: str = Header(...)):
     if not user_agent:
         raise HTTPException(
@@ -22,6 +35,16 @@ def check_user_agent(user_agent: str = Header(...)):
         )
     return user_agent
 
+def token_subject(authorization: str) -> Optional[str]:
+    """Username of a valid bearer token, which scopes Idempotency-Keys; None otherwise."""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
 async def get_current_user(
     session: Session = Depends(get_session),
     token: str = Depends(oauth2_scheme)
@@ -39,7 +62,15 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = session.exec(select(User).where(User.username == username)).first()
+    # Tokens for recently seen users are answered without a user lookup
+    cached = principal_cache.get(username)
+    if cached is not None:
+        return User(**cached)
+    
+    # Run in a copy of this context so the request's query counter sees the lookup
+    context = contextvars.copy_context()
+    user = await asyncio.get_running_loop().run_in_executor(auth_db_executor, context.run, load_user, session, username)
     if user is None:
         raise credentials_exception
+    principal_cache.put(username, user.dict(exclude={"hashed_password"}), payload.get("exp"))
     return user
\ No newline at end of file
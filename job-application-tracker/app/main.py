@@ -1,12 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, Query
 from contextlib import asynccontextmanager
-from app.database import create_db_and_tables
+from app.database import create_db_and_tables, engine
 from app.routers import applications, auth
+from common.idempotency import IdempotencyMiddleware, IdempotencyStore
+from app.dependencies import get_current_user, token_subject
+from app.models import User
+from common.query_log import QueryCountMiddleware, query_stats, route_query_stats
+from common.query_audit import audit_query_plans, check_query_plans, require_query_audit_endpoint
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
     yield
+    # Logs scans an index would fix; fails the run under QUERY_AUDIT_STRICT
+    check_query_plans(engine, query_stats.examples())
 
 app = FastAPI(
     title="Job Application Tracker",
@@ -15,9 +22,39 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Added first so it sits closest to the routes: X-DB-Queries counts the endpoint's own statements
+app.add_middleware(QueryCountMiddleware)
+
+# Retried creates carrying an Idempotency-Key get the stored response
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=["/applications/", "/users/"],
+    store=IdempotencyStore(engine),
+    subject=token_subject
+)
+
 app.include_router(auth.router)
 app.include_router(applications.router)
 
 @app.get("/")
 def read_root():
-    return {"message": "Job Application Tracker API"}
\ No newline at end of file
+    return {"message": "Job Application Tracker API"}
+
+@app.get("/metrics/queries")
+def query_metrics(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("total", pattern="^(total|p95|max|count)$"),
+    current_user: User = Depends(get_current_user)
+):
+    # Most expensive statement shapes seen by this worker
+    return query_stats.top(limit, sort)
+
+@app.get("/metrics/requests")
+def request_query_metrics(current_user: User = Depends(get_current_user)):
+    # Statements and DB time per request for each route, heaviest first
+    return route_query_stats.summary()
+
+@app.get("/metrics/query-plans", dependencies=[Depends(require_query_audit_endpoint)])
+def query_plan_audit(current_user: User = Depends(get_current_user)):
+    # Statements seen by this worker whose plan scans a whole table, with index suggestions
+    return audit_query_plans(engine, query_stats.examples())
@@ -1,6 +1,8 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Index
 from typing import Optional
-from datetime import date
+from datetime import date, datetime
+# Imported so create_all makes its table; see common.idempotency
+from common.idempotency import IdempotencyRecord  # noqa: F401
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -10,9 +12,12 @@ class User(SQLModel, table=True):
     is_active: bool = Field(default=True)
 
 class JobApplication(SQLModel, table=True):
+    # Serves listing by user and searching a user's applications by status
+    __table_args__ = (Index("ix_jobapplication_user_id_status", "user_id", "status"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     company: str = Field(index=True)
     position: str
     status: str = Field(default="applied")  # applied, interview, offer, rejected
     date_applied: date = Field(default_factory=date.today)
-    user_id: int = Field(foreign_key="user.id")
\ No newline at end of file
+    user_id: int = Field(foreign_key="user.id")
@@ -5,10 +5,11 @@ from app.database import get_session
 from app.models import JobApplication, User
 from app.schemas import JobApplicationCreate, JobApplicationResponse
 from app.dependencies import get_current_user, check_user_agent
+from common.query_log import query_budget
 
 router = APIRouter(tags=["applications"])
 
-@router.post("/applications/", response_model=JobApplicationResponse)
+@router.post("/applications/", response_model=JobApplicationResponse, dependencies=[Depends(query_budget(3))])
 def create_job_application(
     application: JobApplicationCreate,
     session: Session = Depends(get_session),
@@ -21,7 +22,7 @@ def create_job_application(
     session.refresh(db_application)
     return db_application
 
-@router.get("/applications/", response_model=List[JobApplicationResponse])
+@router.get("/applications/", response_model=List[JobApplicationResponse], dependencies=[Depends(query_budget(2))])
 def read_applications(
     skip: int = 0,
     limit: int = 100,
@@ -37,7 +38,7 @@ def read_applications(
     ).all()
     return applications
 
-@router.get("/applications/search", response_model=List[JobApplicationResponse])
+@router.get("/applications/search", response_model=List[JobApplicationResponse], dependencies=[Depends(query_budget(2))])
 def search_applications(
     status: str = Query(..., description="Filter applications by status"),
     session: Session = Depends(get_session),
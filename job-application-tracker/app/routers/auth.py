@@ -4,7 +4,11 @@ from sqlmodel import Session, select
 from app.database import get_session
 from app.models import User
 from app.schemas import Token, UserCreate, UserResponse
-from app.dependencies import check_user_agent
+from app.dependencies import check_user_agent, get_current_user
+from common.password_hasher import BCRYPT_ROUNDS, PasswordHasher
+from common.principal_cache import invalidate_principal
+from common.rate_limit import limit_login_attempts
+from common.query_log import query_budget
 from datetime import timedelta, datetime
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -16,20 +20,40 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    # Pinning min and max to the configured factor makes verify_and_update
+    # return a fresh hash for passwords stored with any other factor
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+password_hasher = PasswordHasher(pwd_context)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password, hashed_password):
+    return password_hasher.verify_and_update(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 def authenticate_user(session: Session, username: str, password: str):
     user = session.exec(select(User).where(User.username == username)).first()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not verified:
         return False
+    if new_hash:
+        # Stored with an older work factor; upgrade it while we have the plain password
+        user.hashed_password = new_hash
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        invalidate_principal(user.username)
     return user
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -42,7 +66,8 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-@router.post("/token", response_model=Token)
+# Three statements when the stored hash is upgraded: select, update, reload
+@router.post("/token", response_model=Token, dependencies=[Depends(query_budget(3)), Depends(limit_login_attempts)])
 def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: Session = Depends(get_session),
@@ -61,7 +86,7 @@ def login_for_access_token(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.post("/users/", response_model=UserResponse)
+@router.post("/users/", response_model=UserResponse, dependencies=[Depends(query_budget(4))])
 def create_user(
     user: UserCreate,
     session: Session = Depends(get_session),
@@ -85,4 +110,9 @@ def create_user(
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
-    return db_user
\ No newline at end of file
+    invalidate_principal(db_user.username)
+    return db_user
+
+@router.get("/metrics/hashing")
+def password_hashing_metrics(current_user: User = Depends(get_current_user)):
+    return password_hasher.stats()
@@ -0,0 +1,30 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app.main import app
+from app.database import engine
+from app.models import User
+from common import query_log
+import bcrypt
+import pytest
+
+@pytest.fixture
+def client(monkeypatch):
+    # Going over a query budget raises instead of logging
+    monkeypatch.setattr(query_log, "QUERY_BUDGET_STRICT", True)
+    with TestClient(app) as client:
+        yield client
+
+def test_login_with_a_stale_hash_fits_the_budget(client):
+    # Stored with another work factor, so this login rehashes it
+    stale_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt(5)).decode()
+    with Session(engine) as session:
+        session.add(User(username="stale", email="stale@example.com", hashed_password=stale_hash))
+        session.commit()
+
+    response = client.post("/token", data={"username": "stale", "password": "secret"})
+    assert response.status_code == 200
+    assert int(response.headers["x-db-queries"]) == 3
+
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == "stale")).one()
+        assert user.hashed_password != stale_hash and user.hashed_password.startswith("$2b$04$")
@@ -0,0 +1,144 @@
+from sqlalchemy import Text, text
+from sqlalchemy.types import TypeDecorator
+from typing import Any, Dict, Optional
+import logging
+import zlib
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# zlib, zstd (needs the zstandard package) or none
+NOTES_COMPRESSION = os.getenv("NOTES_COMPRESSION", "zlib").lower()
+# Contents shorter than this (UTF-8 bytes) are stored as plain text
+NOTES_COMPRESS_MIN_BYTES = int(os.getenv("NOTES_COMPRESS_MIN_BYTES", "4096"))
+NOTES_COMPRESSION_LEVEL = os.getenv("NOTES_COMPRESSION_LEVEL")
+# Keep the plain text unless compression shrinks it to at most this fraction
+NOTES_COMPRESS_MAX_RATIO = float(os.getenv("NOTES_COMPRESS_MAX_RATIO", "0.9"))
+
+if NOTES_COMPRESSION == "zstd" and zstandard is None:
+    logger.warning("NOTES_COMPRESSION=zstd but zstandard is not installed; using zlib")
+    NOTES_COMPRESSION = "zlib"
+
+# First byte of every compressed value. Plain values are stored as TEXT, never as
+# BLOB, so the marker cannot collide with them.
+ZLIB_MARKER = b"\x01"
+ZSTD_MARKER = b"\x02"
+
+def compress(data: bytes, codec: str = NOTES_COMPRESSION) -> bytes:
+    if codec == "zstd":
+        level = int(NOTES_COMPRESSION_LEVEL or 3)
+        return ZSTD_MARKER + zstandard.ZstdCompressor(level=level).compress(data)
+    level = int(NOTES_COMPRESSION_LEVEL or 6)
+    return ZLIB_MARKER + zlib.compress(data, level)
+
+def decompress(value: bytes) -> bytes:
+    marker, payload = value[:1], value[1:]
+    if marker == ZLIB_MARKER:
+        return zlib.decompress(payload)
+    if marker == ZSTD_MARKER:
+        if zstandard is None:
+            raise RuntimeError("Note content is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Unknown compression marker {marker!r}")
+
+def encode_content(value: str, codec: str = NOTES_COMPRESSION, min_bytes: int = NOTES_COMPRESS_MIN_BYTES) -> Any:
+    """The stored form of value: compressed bytes if that pays off, else value itself."""
+    data = value.encode("utf-8")
+    if codec == "none" or len(data) < min_bytes:
+        return value
+    compressed = compress(data, codec)
+    if len(compressed) > len(data) * NOTES_COMPRESS_MAX_RATIO:
+        return value
+    return compressed
+
+class CompressedText(TypeDecorator):
+    """Text stored as-is when short and as a marked zlib/zstd BLOB when long.
+
+    Reads accept both forms, so existing plain rows and rows written under another
+    codec or threshold stay readable.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Any:
+        if value is None:
+            return None
+        return encode_content(value)
+
+    def process_result_value(self, value: Any, dialect) -> Optional[str]:
+        if isinstance(value, bytes):
+            return decompress(value).decode("utf-8")
+        return value
+
+def compression_report(connection) -> Dict[str, Any]:
+    """Logical (decompressed) and stored bytes of note content."""
+    plain = connection.execute(text(
+        "SELECT count(*), coalesce(sum(length(CAST(content AS BLOB))), 0) FROM note WHERE typeof(content) != 'blob'"
+    )).one()
+    compressed_rows = 0
+    stored = 0
+    logical = 0
+    # Raw column values: decompress only to measure
+    result = connection.execute(text("SELECT content FROM note WHERE typeof(content) = 'blob'"))
+    for rows in result.partitions(1000):
+        for (value,) in rows:
+            compressed_rows += 1
+            stored += len(value)
+            logical += len(decompress(value))
+    return {
+        "plain_rows": plain[0],
+        "compressed_rows": compressed_rows,
+        "logical_bytes": plain[1] + logical,
+        "stored_bytes": plain[1] + stored,
+        "bytes_saved": logical - stored
+    }
+
+def compress_existing_notes(connection, batch_size: int = 1000) -> int:
+    """Rewrite plain contents that qualify for compression; returns the rows changed."""
+    changed = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(text(
+            "SELECT id, content FROM note WHERE id > :last_id AND typeof(content) != 'blob'"
+            " AND length(CAST(content AS BLOB)) >= :min_bytes ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "min_bytes": NOTES_COMPRESS_MIN_BYTES, "limit": batch_size}).all()
+        if not rows:
+            return changed
+        last_id = rows[-1][0]
+        updates = []
+        for note_id, content in rows:
+            stored = encode_content(content)
+            if isinstance(stored, bytes):
+                updates.append({"note_id": note_id, "stored": stored})
+        if updates:
+            connection.execute(text("UPDATE note SET content = :stored WHERE id = :note_id"), updates)
+            changed += len(updates)
+
+if __name__ == "__main__":
+    import sys
+    from app.database import create_db_and_tables, engine, sqlite_file_name
+
+    # Run from the notes-api directory with the API stopped
+    command = sys.argv[1:]
+    if command == ["migrate"]:
+        create_db_and_tables()
+        before = os.path.getsize(sqlite_file_name)
+        with engine.begin() as connection:
+            changed = compress_existing_notes(connection)
+        # Pages freed by the smaller rows only go back to the OS on VACUUM
+        with engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+        print(f"Compressed {changed} notes with {NOTES_COMPRESSION}; {sqlite_file_name} {before} -> {os.path.getsize(sqlite_file_name)} bytes")
+        with engine.connect() as connection:
+            print(compression_report(connection))
+    elif command == ["report"]:
+        with engine.connect() as connection:
+            print(compression_report(connection))
+    else:
+        sys.exit("usage: python -m app.compression migrate|report")
@@ -1,14 +1,23 @@
-from sqlmodel import create_engine, Session
+from sqlmodel import Session
+from common.sqlite_engine import create_sqlite_engine
+from common.query_log import install_query_log
 from .models import SQLModel
+from .search import ensure_search_index
 
 # Database setup
 sqlite_file_name = "notes.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 
-engine = create_engine(sqlite_url, echo=True)
+engine = create_sqlite_engine(sqlite_url)
+install_query_log(engine)
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist; add indexes declared since then
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    ensure_search_index(engine)
 
 def get_session():
     with Session(engine) as session:
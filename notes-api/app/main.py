@@ -1,9 +1,14 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.database import create_db_and_tables
+from app.database import create_db_and_tables, engine
 from app.middleware import count_requests_middleware, get_request_count
 from app.routes.notes import router as notes_router
+from common.idempotency import IdempotencyMiddleware, IdempotencyStore
+from common.query_log import QueryCountMiddleware, query_stats, route_query_stats
+from common.query_audit import audit_query_plans, check_query_plans, require_query_audit_endpoint
+from app.utils.backup import NOTES_SNAPSHOT_PATH, note_journal
+import asyncio
 import os
 
 @asynccontextmanager
@@ -12,18 +17,30 @@ async def lifespan(app: FastAPI):
     create_db_and_tables()
     
     # Create backup file if it doesn't exist
-    if not os.path.exists("notes.json"):
-        with open("notes.json", "w") as f:
+    if not os.path.exists(NOTES_SNAPSHOT_PATH):
+        with open(NOTES_SNAPSHOT_PATH, "w") as f:
             f.write("[]")
-    
+
+    # Append queued note changes to the journal and compact it in the background
+    flusher = asyncio.get_running_loop().create_task(note_journal.flush_loop())
     yield
-    # Clean up on shutdown (if needed)
+    flusher.cancel()
+    note_journal.flush()
+    note_journal.compact()
+    # Logs scans an index would fix; fails the run under QUERY_AUDIT_STRICT
+    check_query_plans(engine, query_stats.examples())
 
 app = FastAPI(title="Notes API", version="1.0.0", lifespan=lifespan)
 
+# Added first so it sits closest to the routes: X-DB-Queries counts the endpoint's own statements
+app.add_middleware(QueryCountMiddleware)
+
 # Add middleware to count requests
 app.middleware("http")(count_requests_middleware)
 
+# Retried creates carrying an Idempotency-Key get the stored response
+app.add_middleware(IdempotencyMiddleware, paths=["/notes/", "/notes/batch"], store=IdempotencyStore(engine))
+
 # CORS middleware setup
 origins = [
     "http://localhost:3000",
@@ -47,4 +64,22 @@ def read_root():
 
 @app.get("/stats/")
 def get_stats():
-    return {"total_requests": get_request_count()}
\ No newline at end of file
+    return {"total_requests": get_request_count()}
+
+@app.get("/metrics/queries")
+def query_metrics(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("total", pattern="^(total|p95|max|count)$")
+):
+    # Most expensive statement shapes seen by this worker
+    return query_stats.top(limit, sort)
+
+@app.get("/metrics/requests")
+def request_query_metrics():
+    # Statements and DB time per request for each route, heaviest first
+    return route_query_stats.summary()
+
+@app.get("/metrics/query-plans", dependencies=[Depends(require_query_audit_endpoint)])
+def query_plan_audit():
+    # Statements seen by this worker whose plan scans a whole table, with index suggestions
+    return audit_query_plans(engine, query_stats.examples())
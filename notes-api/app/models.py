@@ -1,9 +1,28 @@
-from sqlmodel import Field, SQLModel
+from sqlmodel import Field, SQLModel, Column, Index
+from app.compression import CompressedText
 from datetime import datetime
 from typing import Optional
+# Imported so create_all makes its table; see common.idempotency
+from common.idempotency import IdempotencyRecord  # noqa: F401
 
 class Note(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
-    content: str
-    created_at: datetime = Field(default_factory=datetime.now)
\ No newline at end of file
+    # Large contents are compressed on write and decompressed on read; see app.compression
+    content: str = Field(sa_column=Column(CompressedText, nullable=False))
+    # Indexed for keyset pagination; the index also carries id, which breaks ties
+    created_at: datetime = Field(default_factory=datetime.now, index=True)
+
+# Earlier versions of a note; the note row itself holds the latest. See app.revisions
+class NoteRevision(SQLModel, table=True):
+    __table_args__ = (Index("ix_noterevision_note_id_revision", "note_id", "revision", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    note_id: int = Field(foreign_key="note.id")
+    revision: int
+    title: str
+    # "full": body is the content; "diff": body turns revision + 1's content into this one's
+    kind: str
+    body: str = Field(sa_column=Column(CompressedText, nullable=False))
+    # When the next revision replaced this one
+    superseded_at: datetime = Field(default_factory=datetime.now)
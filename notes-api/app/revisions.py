@@ -0,0 +1,103 @@
+from fastapi import HTTPException
+from sqlalchemy import bindparam, delete, func, or_
+from sqlmodel import Session, select
+from app.models import Note, NoteRevision
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List
+import json
+import os
+
+# Every this many revisions is stored in full, so reading one applies fewer diffs than this
+NOTES_REVISION_KEYFRAME_INTERVAL = int(os.getenv("NOTES_REVISION_KEYFRAME_INTERVAL", "10"))
+
+def line_diff(source: str, target: str) -> str:
+    """Encode target against source: [start, end] copies source lines, a string is new text."""
+    source_lines = source.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    operations: List[Any] = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, source_lines, target_lines).get_opcodes():
+        if tag == "equal":
+            operations.append([i1, i2])
+        elif tag in ("replace", "insert"):
+            operations.append("".join(target_lines[j1:j2]))
+    return json.dumps(operations, separators=(",", ":"))
+
+def apply_line_diff(source: str, diff: str) -> str:
+    source_lines = source.splitlines(keepends=True)
+    return "".join(
+        "".join(source_lines[operation[0]:operation[1]]) if isinstance(operation, list) else operation
+        for operation in json.loads(diff)
+    )
+
+def latest_revision(session: Session, note_id: int) -> int:
+    """Number of the newest stored revision; the note itself is this + 1."""
+    return session.exec(select(func.max(NoteRevision.revision)).where(NoteRevision.note_id == note_id)).one() or 0
+
+def save_revision(session: Session, note: Note, title: str, content: str,
+                  interval: int = NOTES_REVISION_KEYFRAME_INTERVAL):
+    """Store note's current version as a revision and make title/content current.
+
+    The stored revision is a diff from the new content back to the old one, or
+    the old content in full every interval revisions. The caller commits.
+    """
+    revision = latest_revision(session, note.id) + 1
+    if revision % interval == 0:
+        kind, body = "full", note.content
+    else:
+        kind, body = "diff", line_diff(content, note.content)
+    session.add(NoteRevision(note_id=note.id, revision=revision, title=note.title, kind=kind, body=body))
+    note.title = title
+    note.content = content
+    session.add(note)
+
+def list_revisions(session: Session, note: Note) -> List[Dict[str, Any]]:
+    rows = session.exec(
+        select(NoteRevision.revision, NoteRevision.title, NoteRevision.kind, NoteRevision.superseded_at)
+        .where(NoteRevision.note_id == note.id)
+        .order_by(NoteRevision.revision)
+    ).all()
+    # A revision was saved when the one before it was superseded
+    saved_at = note.created_at
+    revisions = []
+    for revision, title, kind, superseded_at in rows:
+        revisions.append({"revision": revision, "title": title, "kind": kind, "saved_at": saved_at})
+        saved_at = superseded_at
+    revisions.append({"revision": len(rows) + 1, "title": note.title, "kind": "current", "saved_at": saved_at})
+    return revisions
+
+def read_revision(session: Session, note: Note, revision: int) -> Dict[str, Any]:
+    """Rebuild one revision from the nearest newer keyframe (or the note) and the diffs in between."""
+    current = latest_revision(session, note.id) + 1
+    if revision == current:
+        return {"revision": revision, "title": note.title, "content": note.content}
+    if not 1 <= revision < current:
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+    keyframe = (
+        select(NoteRevision.revision)
+        .where(NoteRevision.note_id == note.id, NoteRevision.revision >= revision, NoteRevision.kind == "full")
+        .order_by(NoteRevision.revision)
+        .limit(1)
+        .scalar_subquery()
+    )
+    rows = session.exec(
+        select(NoteRevision)
+        .where(
+            NoteRevision.note_id == note.id,
+            NoteRevision.revision >= revision,
+            or_(keyframe.is_(None), NoteRevision.revision <= keyframe)
+        )
+        .order_by(NoteRevision.revision.desc())
+    ).all()
+
+    # Newest first: start from the keyframe if there is one, else from the note
+    content = note.content
+    for row in rows:
+        content = row.body if row.kind == "full" else apply_line_diff(content, row.body)
+    return {"revision": revision, "title": rows[-1].title, "content": content}
+
+def delete_revisions(session: Session, note_ids: Iterable[int]):
+    rows = [{"deleted_note_id": note_id} for note_id in note_ids]
+    if rows:
+        table = NoteRevision.__table__
+        session.execute(delete(table).where(table.c.note_id == bindparam("deleted_note_id")), rows)
@@ -1,27 +1,159 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Body, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select as sa_select, tuple_
 from sqlmodel import Session, select
 from app.models import Note
-from app.database import get_session
-from app.utils.backup import backup_notes_to_json
+from app.database import engine, get_session
+from app.utils.backup import note_journal
+from common.query_log import query_budget
+from common.sqlite_engine import begin_immediate
+from app.search import index_notes, search_notes, unindex_notes
+from app.utils.bulk import NOTES_BATCH_MAX, NOTES_IMPORT_BATCH_SIZE, delete_notes, insert_notes
+from app.revisions import delete_revisions, list_revisions, read_revision, save_revision
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+import json
+import os
+
+# Notes fetched from the cursor per chunk of GET /notes/export
+NOTES_EXPORT_BATCH_SIZE = int(os.getenv("NOTES_EXPORT_BATCH_SIZE", "1000"))
 
 router = APIRouter()
 
-@router.post("/", response_model=Note)
+def parse_note_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, note_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(note_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def iter_notes_ndjson(batch_size: int = NOTES_EXPORT_BATCH_SIZE) -> Iterator[str]:
+    # Its own connection: the stream outlives the request's session. One read
+    # transaction for the whole export, so it is a consistent snapshot.
+    table = Note.__table__
+    with engine.connect() as connection:
+        result = connection.execute(sa_select(table).order_by(table.c.created_at, table.c.id))
+        for rows in result.partitions(batch_size):
+            lines = []
+            for row in rows:
+                note = dict(row._mapping)
+                note["created_at"] = note["created_at"].isoformat()
+                lines.append(json.dumps(note) + "\n")
+            yield "".join(lines)
+
+def check_batch_size(count: int):
+    if count > NOTES_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {NOTES_BATCH_MAX} notes per batch")
+
+def insert_import_batch(notes: List[Note]) -> int:
+    with Session(engine) as session:
+        return len(insert_notes(session, notes))
+
+@router.post("/", response_model=Note, dependencies=[Depends(query_budget(3))])
 def create_note(note: Note, session: Session = Depends(get_session)):
     session.add(note)
+    # Flush for the id so the note and its search entry commit together
+    session.flush()
+    index_notes(session, [note])
     session.commit()
     session.refresh(note)
-    
-    # Backup notes to JSON after creating a new note
-    backup_notes_to_json()
-    
+
+    # Journaled off the request path; see app.utils.backup
+    note_journal.record_create(note)
+
     return note
 
-@router.get("/", response_model=list[Note])
-def list_notes(session: Session = Depends(get_session)):
-    notes = session.exec(select(Note)).all()
+@router.get("/", response_model=list[Note], dependencies=[Depends(query_budget(1))])
+def list_notes(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    session: Session = Depends(get_session)
+):
+    # Keyset pagination, oldest first: each page is an index range scan however deep it is
+    statement = select(Note).order_by(Note.created_at, Note.id).limit(limit)
+    if cursor is not None:
+        created_at, note_id = parse_note_cursor(cursor)
+        statement = statement.where(tuple_(Note.created_at, Note.id) > tuple_(created_at, note_id))
+    notes = session.exec(statement).all()
+
+    if len(notes) == limit:
+        response.headers["X-Next-Cursor"] = f"{notes[-1].created_at.isoformat()}_{notes[-1].id}"
     return notes
 
+# The fixed paths below are declared before /{note_id} so they are not taken for an id
+@router.get("/export")
+def export_notes():
+    # Streams every note as NDJSON in fixed-size batches, so memory stays flat
+    return StreamingResponse(iter_notes_ndjson(), media_type="application/x-ndjson")
+
+@router.get("/search", dependencies=[Depends(query_budget(1))])
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session)
+):
+    results, next_cursor = search_notes(session, q, limit, cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return results
+
+@router.post("/batch", response_model=list[Note], dependencies=[Depends(query_budget(3))])
+def create_notes(notes: list[Note], session: Session = Depends(get_session)):
+    # One executemany each for the notes and their search entries, one journal append
+    check_batch_size(len(notes))
+    return insert_notes(session, notes)
+
+@router.delete("/batch", dependencies=[Depends(query_budget(4))])
+def delete_notes_batch(note_ids: list[int] = Body(...), session: Session = Depends(get_session)):
+    check_batch_size(len(note_ids))
+    return delete_notes(session, note_ids)
+
+@router.post("/import")
+async def import_notes(request: Request):
+    """Create a note for every line of an NDJSON body (e.g. from /notes/export).
+
+    The body is read as it arrives and committed every NOTES_IMPORT_BATCH_SIZE
+    notes. Ids are assigned afresh; created_at is kept when given. On a bad line
+    the batches before it stay imported and the error says how many there were.
+    """
+    imported = 0
+    batch: List[Note] = []
+    buffer = b""
+    line_number = 0
+
+    async def parse_lines(lines: List[bytes]):
+        nonlocal imported, batch, line_number
+        for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                if isinstance(data, dict):
+                    data.pop("id", None)
+                batch.append(Note.validate(data))
+            except (ValueError, ValidationError) as error:
+                raise HTTPException(status_code=400, detail={
+                    "line": line_number, "imported": imported, "error": str(error)
+                })
+            if len(batch) >= NOTES_IMPORT_BATCH_SIZE:
+                imported += await run_in_threadpool(insert_import_batch, batch)
+                batch = []
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        await parse_lines(lines)
+    await parse_lines([buffer])
+    imported += await run_in_threadpool(insert_import_batch, batch)
+
+    return {"imported": imported}
+
 @router.get("/{note_id}", response_model=Note)
 def get_note(note_id: int, session: Session = Depends(get_session)):
     note = session.get(Note, note_id)
@@ -29,16 +161,53 @@ def get_note(note_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Note not found")
     return note
 
+@router.put("/{note_id}", response_model=Note, dependencies=[Depends(query_budget(8))])
+def update_note(note_id: int, update: Note, session: Session = Depends(get_session)):
+    # Concurrent PUTs take turns: each reads the version the previous one saved,
+    # so none is lost and no two number their revision the same
+    begin_immediate(session)
+    note = session.get(Note, note_id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if update.title == note.title and update.content == note.content:
+        return note
+
+    # The version being replaced becomes a revision; see app.revisions
+    save_revision(session, note, update.title, update.content)
+    unindex_notes(session, [note_id])
+    index_notes(session, [note])
+    session.commit()
+    session.refresh(note)
+
+    note_journal.record_update(note)
+
+    return note
+
+@router.get("/{note_id}/revisions", dependencies=[Depends(query_budget(2))])
+def get_note_revisions(note_id: int, session: Session = Depends(get_session)):
+    note = session.get(Note, note_id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return list_revisions(session, note)
+
+@router.get("/{note_id}/revisions/{revision}", dependencies=[Depends(query_budget(3))])
+def get_note_revision(note_id: int, revision: int, session: Session = Depends(get_session)):
+    note = session.get(Note, note_id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return dict(read_revision(session, note, revision), note_id=note_id)
+
 @router.delete("/{note_id}")
 def delete_note(note_id: int, session: Session = Depends(get_session)):
     note = session.get(Note, note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
-    
+
     session.delete(note)
+    unindex_notes(session, [note_id])
+    delete_revisions(session, [note_id])
     session.commit()
-    
-    # Backup notes to JSON after deletion
-    backup_notes_to_json()
-    
+
+    note_journal.record_delete(note_id)
+
     return {"message": "Note deleted successfully"}
\ No newline at end of file
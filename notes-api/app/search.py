@@ -0,0 +1,98 @@
+from fastapi import HTTPException
+from sqlalchemy import select, text
+from sqlmodel import Session
+from app.models import Note
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import re
+import os
+
+# bm25 column weights: a match in the title counts this many times a match in the content
+SEARCH_TITLE_WEIGHT = float(os.getenv("SEARCH_TITLE_WEIGHT", "10.0"))
+# Tokens of content shown around the matches in each snippet
+SEARCH_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", "12"))
+
+# Kept by the app rather than by triggers on note, so it always indexes the text
+# clients wrote. rowid is the note id.
+CREATE_NOTE_FTS = text(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5(title, content, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+_TERM_RE = re.compile(r'[^\s"]+\*?')
+
+def ensure_search_index(engine):
+    """Create note_fts and fill it from the note table if it is missing any notes."""
+    with Session(engine) as session:
+        session.execute(CREATE_NOTE_FTS)
+        notes = session.execute(text("SELECT count(*) FROM note")).scalar()
+        indexed = session.execute(text("SELECT count(*) FROM note_fts")).scalar()
+        if notes != indexed:
+            rebuild_search_index(session)
+        session.commit()
+
+def rebuild_search_index(session: Session):
+    # Read through the Note column types: stored content may be compressed
+    table = Note.__table__
+    session.execute(text("DELETE FROM note_fts"))
+    result = session.execute(select(table.c.id, table.c.title, table.c.content))
+    for rows in result.partitions(1000):
+        index_notes(session, rows)
+
+def index_notes(session: Session, notes: Iterable[Any]):
+    """Add notes to the index in the caller's transaction (one executemany)."""
+    rows = [{"id": note.id, "title": note.title, "content": note.content} for note in notes]
+    if rows:
+        session.execute(text("INSERT INTO note_fts (rowid, title, content) VALUES (:id, :title, :content)"), rows)
+
+def unindex_notes(session: Session, note_ids: Iterable[int]):
+    rows = [{"id": note_id} for note_id in note_ids]
+    if rows:
+        session.execute(text("DELETE FROM note_fts WHERE rowid = :id"), rows)
+
+def match_expression(q: str) -> str:
+    """Quote each word so user input is never parsed as FTS5 syntax; "word*" keeps prefix matching."""
+    terms = []
+    for term in _TERM_RE.findall(q):
+        prefix = term.endswith("*")
+        term = term.rstrip("*")
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query has no terms")
+    return " ".join(terms)
+
+def parse_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        rank, note_id = cursor.rsplit(":", 1)
+        return float(rank), int(note_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def search_notes(session: Session, q: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of notes matching q, best bm25 rank first, and the cursor of the next page."""
+    statement = (
+        "SELECT rowid AS id, rank,"
+        " highlight(note_fts, 0, '<b>', '</b>') AS title,"
+        " snippet(note_fts, 1, '<b>', '</b>', '…', :snippet_tokens) AS snippet"
+        " FROM note_fts WHERE note_fts MATCH :match AND rank MATCH :ranking"
+    )
+    parameters: Dict[str, Any] = {
+        "match": match_expression(q),
+        "ranking": f"bm25({SEARCH_TITLE_WEIGHT}, 1.0)",
+        "snippet_tokens": SEARCH_SNIPPET_TOKENS,
+        # One extra row tells whether there is a next page
+        "limit": limit + 1
+    }
+    if cursor is not None:
+        # Lower rank is a better match; ties are broken by id
+        parameters["after_rank"], parameters["after_id"] = parse_cursor(cursor)
+        statement += " AND (rank > :after_rank OR (rank = :after_rank AND rowid > :after_id))"
+    statement += " ORDER BY rank, rowid LIMIT :limit"
+
+    rows = [dict(row._mapping) for row in session.execute(text(statement), parameters)]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        # repr round-trips the float exactly, so the next page starts right after this row
+        next_cursor = f"{rows[-1]['rank']!r}:{rows[-1]['id']}"
+    return rows, next_cursor
@@ -1,16 +1,209 @@
+from sqlalchemy import delete, insert
+from sqlmodel import Session
+from app.models import Note, NoteRevision
+from app.search import rebuild_search_index
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+import asyncio
+import fcntl
 import json
-from sqlmodel import select
-from app.database import get_session
-from app.models import Note
-
-def backup_notes_to_json():
-    with next(get_session()) as session:
-        notes = session.exec(select(Note)).all()
-        notes_data = [note.dict() for note in notes]
-        
-        # Convert datetime objects to strings for JSON serialization
-        for note in notes_data:
-            note["created_at"] = note["created_at"].isoformat()
-        
-        with open("notes.json", "w") as f:
-            json.dump(notes_data, f, indent=2)
\ No newline at end of file
+import logging
+import threading
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+NOTES_SNAPSHOT_PATH = os.getenv("NOTES_SNAPSHOT_PATH", "notes.json")
+NOTES_JOURNAL_PATH = os.getenv("NOTES_JOURNAL_PATH", "notes.journal.ndjson")
+NOTES_JOURNAL_FLUSH_INTERVAL_SECONDS = float(os.getenv("NOTES_JOURNAL_FLUSH_INTERVAL_SECONDS", "1"))
+# The journal is folded into the snapshot when it grows past this size or this age
+NOTES_JOURNAL_COMPACT_BYTES = int(os.getenv("NOTES_JOURNAL_COMPACT_BYTES", str(16 * 1024 * 1024)))
+NOTES_JOURNAL_COMPACT_INTERVAL_SECONDS = float(os.getenv("NOTES_JOURNAL_COMPACT_INTERVAL_SECONDS", "300"))
+NOTES_JOURNAL_FSYNC = os.getenv("NOTES_JOURNAL_FSYNC", "true").lower() in ("1", "true", "yes")
+
+def note_to_dict(note: Note) -> Dict[str, Any]:
+    data = note.dict()
+    data["created_at"] = data["created_at"].isoformat()
+    return data
+
+def replay(notes: Dict[int, Dict[str, Any]], lines) -> Dict[int, Dict[str, Any]]:
+    """Apply journal lines to notes (keyed by id). Replaying an entry twice is harmless."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # A crash mid-append leaves a torn last line; that entry never reached disk
+            logger.warning("Skipping unreadable journal line %d", number)
+            continue
+        if entry["op"] in ("create", "update"):
+            notes[entry["note"]["id"]] = entry["note"]
+        elif entry["op"] == "delete":
+            notes.pop(entry["id"], None)
+    return notes
+
+class NoteJournal:
+    """Append-only NDJSON log of note changes, folded periodically into the JSON snapshot.
+
+    Routes only queue entries; flush() appends them off the request path. State is
+    snapshot + journal, so a crash loses at most the entries queued since the last
+    flush. Workers share both files: appends and compactions hold an exclusive
+    lock on journal_path + ".lock", so one worker's compaction never drops
+    entries another is appending. Entries are ordered by flush, so when two
+    workers change the same note within one flush interval either version may
+    be the one replayed.
+    """
+
+    def __init__(self, snapshot_path: str = NOTES_SNAPSHOT_PATH, journal_path: str = NOTES_JOURNAL_PATH):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # Held while the journal file is written or compacted; see _locked()
+        self._file_lock = threading.Lock()
+        self._last_compaction = time.monotonic()
+
+    @contextmanager
+    def _locked(self):
+        # The thread lock orders this worker's threads, flock orders the workers
+        with self._file_lock:
+            with open(self.journal_path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def record_create(self, note: Note):
+        self.record_creates([note])
+
+    def record_creates(self, notes: Iterable[Note]):
+        entries = [{"op": "create", "note": note_to_dict(note)} for note in notes]
+        with self._lock:
+            self._pending.extend(entries)
+
+    def record_update(self, note: Note):
+        with self._lock:
+            self._pending.append({"op": "update", "note": note_to_dict(note)})
+
+    def record_delete(self, note_id: int):
+        self.record_deletes([note_id])
+
+    def record_deletes(self, note_ids: Iterable[int]):
+        entries = [{"op": "delete", "id": note_id} for note_id in note_ids]
+        with self._lock:
+            self._pending.extend(entries)
+
+    def flush(self) -> int:
+        """Append queued entries to the journal in one write."""
+        with self._locked():
+            with self._lock:
+                entries, self._pending = self._pending, []
+            if not entries:
+                return 0
+            try:
+                with open(self.journal_path, "a") as f:
+                    f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+                    f.flush()
+                    if NOTES_JOURNAL_FSYNC:
+                        os.fsync(f.fileno())
+            except Exception:
+                # Put them back in front so the next flush retries them in order
+                with self._lock:
+                    self._pending[:0] = entries
+                raise
+            return len(entries)
+
+    def load(self) -> Dict[int, Dict[str, Any]]:
+        """Current notes as of the last flush: the snapshot with the journal replayed on top."""
+        notes: Dict[int, Dict[str, Any]] = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                notes = {note["id"]: note for note in json.load(f)}
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path) as f:
+                replay(notes, f)
+        return notes
+
+    def compact(self) -> Optional[int]:
+        """Fold the journal into a new snapshot, swapped in with an atomic rename.
+
+        A crash before the rename keeps the old snapshot and the whole journal; a
+        crash after it replays journal entries the snapshot already holds.
+        """
+        with self._locked():
+            self._last_compaction = time.monotonic()
+            if not os.path.exists(self.journal_path) or os.path.getsize(self.journal_path) == 0:
+                return None
+            notes = self.load()
+
+            temporary_path = self.snapshot_path + ".tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(list(notes.values()), f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary_path, self.snapshot_path)
+            open(self.journal_path, "w").close()
+            return len(notes)
+
+    def should_compact(self) -> bool:
+        if not os.path.exists(self.journal_path):
+            return False
+        size = os.path.getsize(self.journal_path)
+        age = time.monotonic() - self._last_compaction
+        return size >= NOTES_JOURNAL_COMPACT_BYTES or (size > 0 and age >= NOTES_JOURNAL_COMPACT_INTERVAL_SECONDS)
+
+    def flush_and_compact(self):
+        self.flush()
+        if self.should_compact():
+            self.compact()
+
+    async def flush_loop(self, interval: float = NOTES_JOURNAL_FLUSH_INTERVAL_SECONDS):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.flush_and_compact)
+            except Exception:
+                logger.exception("Notes journal flush failed")
+
+note_journal = NoteJournal()
+
+def restore_notes(session: Session, journal: NoteJournal = note_journal) -> int:
+    """Replace every note (and the search index) with the snapshot + journal contents.
+
+    Revision history is dropped.
+    """
+    notes = journal.load()
+    rows = [
+        dict(note, created_at=datetime.fromisoformat(note["created_at"]))
+        for note in notes.values()
+    ]
+    table = Note.__table__
+    # The journal holds current versions only. Revisions are diffs against the
+    # versions they were saved from, so they cannot outlive a restore.
+    session.execute(delete(NoteRevision.__table__))
+    session.execute(delete(table))
+    if rows:
+        session.execute(insert(table), rows)
+    rebuild_search_index(session)
+    session.commit()
+    return len(rows)
+
+if __name__ == "__main__":
+    import sys
+    from app.database import create_db_and_tables, engine
+
+    # Run from the notes-api directory with the API stopped
+    command = sys.argv[1:]
+    if command == ["restore"]:
+        create_db_and_tables()
+        with Session(engine) as session:
+            print(f"Restored {restore_notes(session)} notes from {NOTES_SNAPSHOT_PATH} and {NOTES_JOURNAL_PATH}")
+    elif command == ["compact"]:
+        print(f"Compacted {note_journal.compact() or 0} notes into {NOTES_SNAPSHOT_PATH}")
+    else:
+        sys.exit("usage: python -m app.utils.backup restore|compact")
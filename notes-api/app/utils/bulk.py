@@ -0,0 +1,65 @@
+from sqlalchemy import bindparam, delete, select, text
+from sqlmodel import Session
+from app.models import Note
+from app.search import index_notes, unindex_notes
+from app.revisions import delete_revisions
+from app.utils.backup import note_journal
+from typing import Dict, List, Sequence
+import os
+
+# Most notes accepted by one POST /notes/batch or DELETE /notes/batch
+NOTES_BATCH_MAX = int(os.getenv("NOTES_BATCH_MAX", "1000"))
+# Notes per transaction during POST /notes/import
+NOTES_IMPORT_BATCH_SIZE = int(os.getenv("NOTES_IMPORT_BATCH_SIZE", "1000"))
+# Rows per INSERT statement: three bound values each, under SQLite's 32766-variable limit
+NOTES_PER_INSERT = 10000
+
+def insert_notes(session: Session, notes: Sequence[Note]) -> List[Note]:
+    """Insert notes with multi-row INSERT ... RETURNING id, index and journal them once, and commit.
+
+    Returns the notes with their ids set.
+    """
+    if not notes:
+        return []
+    ids: List[int] = []
+    for start in range(0, len(notes), NOTES_PER_INSERT):
+        ids += _insert_returning_ids(session, notes[start:start + NOTES_PER_INSERT])
+    created = [
+        Note(id=note_id, title=note.title, content=note.content, created_at=note.created_at)
+        for note_id, note in zip(ids, notes)
+    ]
+    index_notes(session, created)
+    session.commit()
+
+    note_journal.record_creates(created)
+    return created
+
+def _insert_returning_ids(session: Session, notes: Sequence[Note]) -> List[int]:
+    # SQLAlchemy 1.4's SQLite dialect cannot render RETURNING, so the statement is
+    # text; typed binds still compress content and format created_at
+    table = Note.__table__
+    rows = ", ".join(f"(:title_{i}, :content_{i}, :created_at_{i})" for i in range(len(notes)))
+    statement = text(f"INSERT INTO note (title, content, created_at) VALUES {rows} RETURNING id").bindparams(
+        *(bindparam(f"content_{i}", type_=table.c.content.type) for i in range(len(notes))),
+        *(bindparam(f"created_at_{i}", type_=table.c.created_at.type) for i in range(len(notes)))
+    )
+    parameters = {}
+    for i, note in enumerate(notes):
+        parameters.update({f"title_{i}": note.title, f"content_{i}": note.content, f"created_at_{i}": note.created_at})
+    # RETURNING gives no row order, but rows are inserted in VALUES order and
+    # each takes a higher id than the one before it
+    return sorted(session.execute(statement, parameters).scalars())
+
+def delete_notes(session: Session, note_ids: Sequence[int]) -> Dict[str, List[int]]:
+    """Delete the notes that exist (and their revisions) with executemany, unindex and journal them once, and commit."""
+    table = Note.__table__
+    requested = list(dict.fromkeys(note_ids))
+    found = set(session.execute(select(table.c.id).where(table.c.id.in_(requested))).scalars())
+    deleted = [note_id for note_id in requested if note_id in found]
+    if deleted:
+        session.execute(delete(table).where(table.c.id == bindparam("note_id")), [{"note_id": note_id} for note_id in deleted])
+        unindex_notes(session, deleted)
+        delete_revisions(session, deleted)
+        session.commit()
+        note_journal.record_deletes(deleted)
+    return {"deleted": deleted, "not_found": [note_id for note_id in requested if note_id not in found]}
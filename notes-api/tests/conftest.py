@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The app opens notes.db and its journal relative to the working directory
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.chdir(tempfile.mkdtemp(prefix="notes-api-tests-"))
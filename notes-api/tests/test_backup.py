@@ -0,0 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlmodel import Session, select
+from app.database import create_db_and_tables, engine
+from app.models import Note, NoteRevision
+from app.search import search_notes
+from app.utils.backup import NoteJournal, replay, restore_notes
+import json
+import pytest
+
+def make_note(note_id: int, title: str, content: str = "body") -> Note:
+    return Note(id=note_id, title=title, content=content, created_at=datetime(2024, 1, 2, 3, 4, 5))
+
+@pytest.fixture
+def journal(tmp_path):
+    return NoteJournal(str(tmp_path / "notes.json"), str(tmp_path / "notes.journal.ndjson"))
+
+def titles(notes):
+    return {note_id: note["title"] for note_id, note in notes.items()}
+
+def test_replay_applies_creates_updates_and_deletes_in_order():
+    lines = [
+        json.dumps({"op": "create", "note": {"id": 1, "title": "one"}}),
+        json.dumps({"op": "create", "note": {"id": 2, "title": "two"}}),
+        "",
+        json.dumps({"op": "update", "note": {"id": 1, "title": "one, edited"}}),
+        json.dumps({"op": "delete", "id": 2}),
+    ]
+    notes = replay({}, lines)
+    assert titles(notes) == {1: "one, edited"}
+    # Entries already in the snapshot may be replayed again after a compaction crash
+    assert titles(replay(notes, lines)) == {1: "one, edited"}
+
+def test_a_torn_last_line_is_skipped():
+    lines = [json.dumps({"op": "create", "note": {"id": 1, "title": "one"}}), '{"op": "create", "note": {"id": 2, "ti']
+    assert titles(replay({}, lines)) == {1: "one"}
+
+def test_flushed_changes_round_trip(journal):
+    journal.record_creates([make_note(1, "one"), make_note(2, "two"), make_note(3, "three")])
+    journal.record_update(make_note(2, "two, edited", "new body"))
+    journal.record_deletes([3])
+    # Nothing reaches the file until a flush
+    assert journal.load() == {}
+    assert journal.flush() == 5
+    assert journal.flush() == 0
+
+    notes = journal.load()
+    assert titles(notes) == {1: "one", 2: "two, edited"}
+    assert notes[2] == {"id": 2, "title": "two, edited", "content": "new body", "created_at": "2024-01-02T03:04:05"}
+
+def test_compaction_folds_the_journal_into_the_snapshot(journal):
+    journal.record_creates([make_note(1, "one"), make_note(2, "two")])
+    journal.flush()
+    before = journal.load()
+
+    assert journal.compact() == 2
+    with open(journal.journal_path) as f:
+        assert f.read() == ""
+    assert journal.load() == before
+    # An empty journal leaves the snapshot alone
+    assert journal.compact() is None
+
+    journal.record_delete(1)
+    journal.flush()
+    assert titles(journal.load()) == {2: "two"}
+
+def test_recovers_from_a_crash_between_the_rename_and_the_truncate(journal):
+    journal.record_creates([make_note(1, "one")])
+    journal.record_update(make_note(1, "one, edited"))
+    journal.flush()
+    with open(journal.journal_path) as f:
+        uncompacted = f.read()
+    journal.compact()
+
+    # As if the process died before emptying the journal: the snapshot already holds its entries
+    with open(journal.journal_path, "w") as f:
+        f.write(uncompacted)
+    assert titles(journal.load()) == {1: "one, edited"}
+
+def test_recovers_from_a_crash_mid_append(journal):
+    journal.record_creates([make_note(1, "one"), make_note(2, "two")])
+    journal.flush()
+    with open(journal.journal_path, "a") as f:
+        f.write('{"op": "delete", "i')
+
+    assert titles(journal.load()) == {1: "one", 2: "two"}
+    assert journal.compact() == 2
+    assert titles(journal.load()) == {1: "one", 2: "two"}
+
+def test_workers_sharing_the_files_lose_no_entries(journal):
+    # A second worker's journal over the same paths
+    other = NoteJournal(journal.snapshot_path, journal.journal_path)
+
+    def write(worker: int):
+        mine = journal if worker % 2 else other
+        for number in range(50):
+            note_id = worker * 1000 + number
+            mine.record_create(make_note(note_id, f"note {note_id}"))
+            mine.flush()
+            if number % 10 == 0:
+                mine.compact()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write, range(8)))
+
+    assert len(journal.load()) == 8 * 50
+
+def test_restore_notes_replaces_the_table_and_the_search_index(journal):
+    create_db_and_tables()
+    with Session(engine) as session:
+        session.add(Note(title="stale", content="gone after the restore"))
+        session.commit()
+
+    journal.record_creates([make_note(7001, "kept"), make_note(7002, "zebra crossing", "stripes")])
+    journal.record_delete(7001)
+    journal.flush()
+    journal.compact()
+    journal.record_update(make_note(7002, "zebra crossing", "black and white stripes"))
+    journal.flush()
+
+    with Session(engine) as session:
+        assert restore_notes(session, journal) == 1
+        notes = session.exec(select(Note)).all()
+        assert [(note.id, note.content) for note in notes] == [(7002, "black and white stripes")]
+        assert session.exec(select(NoteRevision)).all() == []
+        matches, _ = search_notes(session, "zebra", 10)
+        assert [match["id"] for match in matches] == [7002]
@@ -0,0 +1,65 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.database import engine
+from app.main import app
+from app.routes import notes as notes_routes
+from app.utils.bulk import insert_notes
+from app.models import Note
+import json
+import pytest
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def test_batch_create_returns_each_note_with_its_id(client):
+    long_content = "a long paragraph that compresses well\n" * 500
+    payload = [{"title": f"batch {n}", "content": long_content if n == 1 else f"short {n}"} for n in range(3)]
+    created = client.post("/notes/batch", json=payload).json()
+
+    assert [note["title"] for note in created] == ["batch 0", "batch 1", "batch 2"]
+    for note in created:
+        assert client.get(f"/notes/{note['id']}").json() == note
+    assert created[1]["content"] == long_content
+
+def test_batch_delete_reports_what_was_not_found(client):
+    created = client.post("/notes/batch", json=[{"title": f"doomed {n}", "content": "x"} for n in range(2)]).json()
+    ids = [note["id"] for note in created]
+
+    response = client.request("DELETE", "/notes/batch", json=ids + [ids[0], 987654321])
+    assert response.json() == {"deleted": ids, "not_found": [987654321]}
+    assert all(client.get(f"/notes/{note_id}").status_code == 404 for note_id in ids)
+
+def test_ids_of_deleted_newest_notes_are_reused_correctly(client):
+    first = client.post("/notes/batch", json=[{"title": f"gone {n}", "content": "bassoon"} for n in range(3)]).json()
+    client.request("DELETE", "/notes/batch", json=[note["id"] for note in first])
+
+    # note has no AUTOINCREMENT, so the next batch takes the same ids again
+    second = client.post("/notes/batch", json=[{"title": f"new {n}", "content": f"oboe{n}"} for n in range(3)]).json()
+    assert [note["id"] for note in second] == [note["id"] for note in first]
+    for note in second:
+        assert client.get(f"/notes/{note['id']}").json()["title"] == note["title"]
+        [match] = client.get("/notes/search", params={"q": note["content"]}).json()
+        assert match["id"] == note["id"]
+    assert client.get("/notes/search", params={"q": "bassoon"}).json() == []
+
+def test_statements_are_split_past_the_variable_limit(monkeypatch):
+    monkeypatch.setattr("app.utils.bulk.NOTES_PER_INSERT", 2)
+    with Session(engine) as session:
+        created = insert_notes(session, [Note(title=f"split {n}", content="z") for n in range(5)])
+        ids = [note.id for note in created]
+        assert ids == list(range(ids[0], ids[0] + 5))
+        assert [session.get(Note, note_id).title for note_id in ids] == [f"split {n}" for n in range(5)]
+
+def test_import_reports_the_bad_line_and_keeps_earlier_batches(client, monkeypatch):
+    monkeypatch.setattr(notes_routes, "NOTES_IMPORT_BATCH_SIZE", 2)
+    lines = [json.dumps({"id": 1, "title": f"imported {n}", "content": "c"}) for n in range(5)]
+    lines.insert(4, "{not json")
+    before = len(client.get("/notes/", params={"limit": 1000}).json())
+
+    response = client.post("/notes/import", content="\n".join(lines))
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert (detail["line"], detail["imported"]) == (5, 4)
+    assert len(client.get("/notes/", params={"limit": 1000}).json()) == before + 4
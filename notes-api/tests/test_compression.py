@@ -0,0 +1,100 @@
+from sqlalchemy import text
+from sqlmodel import Session
+from app import compression
+from app.compression import compress, compress_existing_notes, compression_report, decompress, encode_content
+from app.models import Note
+from common.sqlite_engine import create_sqlite_engine
+import os
+import pytest
+import subprocess
+import sys
+
+LONG = "the same sentence, repeated until it is worth compressing. " * 200
+SHORT = "too short to bother"
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'notes.db'}")
+    Note.__table__.create(engine)
+    return engine
+
+def stored(connection, note_id: int):
+    # The raw column value, bypassing CompressedText
+    return connection.execute(text("SELECT content FROM note WHERE id = :id"), {"id": note_id}).scalar()
+
+def test_contents_round_trip_compressed_or_not(engine):
+    with Session(engine) as session:
+        notes = [Note(title="long", content=LONG), Note(title="short", content=SHORT), Note(title="accents", content="café ☕ " * 1000)]
+        session.add_all(notes)
+        session.commit()
+        ids = [note.id for note in notes]
+
+    with engine.connect() as connection:
+        assert isinstance(stored(connection, ids[0]), bytes)
+        assert len(stored(connection, ids[0])) < len(LONG) // 10
+        assert stored(connection, ids[1]) == SHORT
+    with Session(engine) as session:
+        assert [session.get(Note, note_id).content for note_id in ids] == [LONG, SHORT, "café ☕ " * 1000]
+
+def test_content_that_does_not_shrink_enough_stays_plain(monkeypatch):
+    monkeypatch.setattr(compression, "NOTES_COMPRESS_MAX_RATIO", 0.001)
+    assert encode_content(LONG) == LONG
+
+def test_legacy_plain_rows_are_read_as_they_are(engine):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO note (id, title, content, created_at) VALUES (1, 'old', :content, '2020-01-01 00:00:00.000000')"), {"content": LONG})
+    with Session(engine) as session:
+        assert session.get(Note, 1).content == LONG
+
+def test_zstd_rows_are_readable():
+    pytest.importorskip("zstandard")
+    value = compress(LONG.encode(), "zstd")
+    assert value[:1] == compression.ZSTD_MARKER
+    assert decompress(value).decode() == LONG
+    # Stored zlib rows stay readable whatever the configured codec
+    assert decompress(compress(LONG.encode(), "zlib")).decode() == LONG
+
+def test_reading_zstd_rows_without_zstandard_says_what_is_missing(monkeypatch):
+    pytest.importorskip("zstandard")
+    value = compress(LONG.encode(), "zstd")
+    monkeypatch.setattr(compression, "zstandard", None)
+    with pytest.raises(RuntimeError, match="install zstandard"):
+        decompress(value)
+
+def test_zstd_falls_back_to_zlib_when_zstandard_is_missing():
+    # A fresh interpreter, since the codec is chosen when the module is imported
+    script = "import sys; sys.modules['zstandard'] = None; from app import compression; print(compression.NOTES_COMPRESSION)"
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=app_dir, capture_output=True, text=True,
+        env=dict(os.environ, NOTES_COMPRESSION="zstd"), check=True
+    ).stdout
+    assert output.strip() == "zlib"
+
+def test_compress_existing_notes_and_the_report(engine):
+    with engine.begin() as connection:
+        for note_id, content in ((1, LONG), (2, SHORT), (3, LONG + "!")):
+            connection.execute(
+                text("INSERT INTO note (id, title, content, created_at) VALUES (:id, 't', :content, '2020-01-01 00:00:00.000000')"),
+                {"id": note_id, "content": content}
+            )
+        before = compression_report(connection)
+        assert before == {
+            "plain_rows": 3, "compressed_rows": 0,
+            "logical_bytes": len(LONG) * 2 + 1 + len(SHORT), "stored_bytes": len(LONG) * 2 + 1 + len(SHORT), "bytes_saved": 0
+        }
+
+        assert compress_existing_notes(connection, batch_size=1) == 2
+        # Already compressed rows are skipped on a second run
+        assert compress_existing_notes(connection) == 0
+
+        after = compression_report(connection)
+        stored_long = len(stored(connection, 1)) + len(stored(connection, 3))
+        assert after == {
+            "plain_rows": 1, "compressed_rows": 2,
+            "logical_bytes": before["logical_bytes"], "stored_bytes": stored_long + len(SHORT),
+            "bytes_saved": len(LONG) * 2 + 1 - stored_long
+        }
+
+    with Session(engine) as session:
+        assert [session.get(Note, note_id).content for note_id in (1, 2, 3)] == [LONG, SHORT, LONG + "!"]
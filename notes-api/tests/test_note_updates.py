@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from app.main import app
+
+def test_concurrent_updates_each_become_a_revision():
+    writers = 16
+    with TestClient(app) as client:
+        note = client.post("/notes/", json={"title": "original", "content": "line\n" * 50}).json()
+
+        def put(number: int):
+            return client.put(
+                f"/notes/{note['id']}",
+                json={"title": f"update {number}", "content": "line\n" * 50 + f"update {number}\n"}
+            )
+
+        with ThreadPoolExecutor(max_workers=writers) as executor:
+            responses = list(executor.map(put, range(writers)))
+        assert [response.status_code for response in responses] == [200] * writers
+
+        # Every update replaced the version before it, so none was lost
+        revisions = client.get(f"/notes/{note['id']}/revisions").json()
+        assert [revision["revision"] for revision in revisions] == list(range(1, writers + 2))
+        titles = [
+            client.get(f"/notes/{note['id']}/revisions/{revision['revision']}").json()["title"]
+            for revision in revisions
+        ]
+        assert titles[0] == "original"
+        assert sorted(titles[1:]) == sorted(f"update {number}" for number in range(writers))
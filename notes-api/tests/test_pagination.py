@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app.database import engine
+from app.main import app
+from app.models import Note
+from app.routes.notes import iter_notes_ndjson
+import json
+
+def test_keyset_pages_have_no_gaps_or_duplicates_across_equal_timestamps():
+    with TestClient(app) as client:
+        # Several notes share each created_at, so only the id tie-break orders them
+        for second in range(3):
+            client.post("/notes/batch", json=[
+                {"title": f"tie {second}.{copy}", "content": "x", "created_at": f"2000-01-01T00:00:0{second}"}
+                for copy in range(4)
+            ])
+        with Session(engine) as session:
+            expected = [note.id for note in session.exec(select(Note).order_by(Note.created_at, Note.id))]
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 5}
+            if cursor is not None:
+                params["cursor"] = cursor
+            response = client.get("/notes/", params=params)
+            seen += [note["id"] for note in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+    assert seen == expected
+
+def test_an_invalid_cursor_is_rejected():
+    with TestClient(app) as client:
+        for cursor in ("garbage", "2000-01-01T00:00:00_x", "yesterday_5"):
+            assert client.get("/notes/", params={"cursor": cursor}).status_code == 400
+
+def test_export_has_one_line_per_note():
+    with TestClient(app) as client:
+        client.post("/notes/batch", json=[{"title": f"export {n}", "content": "y"} for n in range(7)])
+        response = client.get("/notes/export")
+        with Session(engine) as session:
+            ids = [note.id for note in session.exec(select(Note).order_by(Note.created_at, Note.id))]
+
+    lines = response.text.splitlines()
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in lines] == ids
+    # Batches split the stream between notes, never inside one
+    chunks = list(iter_notes_ndjson(batch_size=3))
+    assert len(chunks) == -(-len(ids) // 3)
+    assert "".join(chunks).splitlines() == lines
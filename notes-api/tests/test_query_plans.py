@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.main import app
+from app.database import engine
+from common import query_audit
+import pytest
+
+@pytest.fixture(autouse=True)
+def strict_audit(monkeypatch):
+    monkeypatch.setattr(query_audit, "QUERY_AUDIT_STRICT", True)
+
+def exercise(client: TestClient):
+    note = client.post("/notes/", json={"title": "t", "content": "c"}).json()
+    client.put(f"/notes/{note['id']}", json={"title": "t2", "content": "c2"})
+    client.get(f"/notes/{note['id']}/revisions")
+    client.get("/notes/search", params={"q": "c2"})
+
+def test_strict_shutdown_passes_when_every_query_is_indexed():
+    with TestClient(app) as client:
+        exercise(client)
+
+def test_strict_shutdown_fails_on_a_full_table_scan():
+    with pytest.raises(AssertionError, match="ix_noterevision_note_id"):
+        with TestClient(app) as client:
+            # Startup recreates missing indexes, so drop it once the app is up
+            with engine.begin() as connection:
+                connection.execute(text("DROP INDEX ix_noterevision_note_id_revision"))
+            exercise(client)
+
+def test_query_plans_endpoint_is_off_by_default(monkeypatch):
+    with TestClient(app) as client:
+        assert client.get("/metrics/query-plans").status_code == 404
+        monkeypatch.setattr(query_audit, "QUERY_AUDIT_ENDPOINT", True)
+        assert client.get("/metrics/query-plans").status_code == 200
@@ -0,0 +1,67 @@
+from fastapi.testclient import TestClient
+from app.main import app
+import pytest
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def create(client: TestClient, title: str, content: str) -> int:
+    return client.post("/notes/", json={"title": title, "content": content}).json()["id"]
+
+def test_a_title_match_outranks_a_content_match(client):
+    in_content = create(client, "Shopping list", "buy strings for the xylophone and some milk")
+    in_title = create(client, "Xylophone practice", "scales in C major")
+
+    results = client.get("/notes/search", params={"q": "xylophone"}).json()
+    assert [result["id"] for result in results] == [in_title, in_content]
+    assert results[0]["rank"] < results[1]["rank"]
+
+def test_results_highlight_the_title_and_snippet_the_content(client):
+    before = " ".join(f"before{number}" for number in range(40))
+    after = " ".join(f"after{number}" for number in range(40))
+    note_id = create(client, "Marimba notes", f"{before} the marimba needs tuning {after}")
+
+    [result] = client.get("/notes/search", params={"q": "marimba"}).json()
+    assert result["id"] == note_id
+    assert result["title"] == "<b>Marimba</b> notes"
+    # Only the tokens around the match, not the whole content
+    assert "<b>marimba</b> needs tuning" in result["snippet"]
+    assert result["snippet"].startswith("…") and result["snippet"].endswith("…")
+    assert "before0 " not in result["snippet"] and "after39" not in result["snippet"]
+
+def test_fts5_syntax_in_the_query_is_searched_as_words(client):
+    note_id = create(client, "Ocarina", 'the ocarina said "hello" NEAR the end: title')
+
+    for q in ['ocarina OR', '"ocarina"', 'ocarina NEAR(', 'title: ocarina', 'ocarina -end', '(ocarina) AND']:
+        response = client.get("/notes/search", params={"q": q})
+        assert response.status_code == 200, q
+    # Operators are quoted into plain terms, so each must appear in the note
+    assert [r["id"] for r in client.get("/notes/search", params={"q": "ocarina NEAR"}).json()] == [note_id]
+    assert client.get("/notes/search", params={"q": "ocarina OR nothinglikethis"}).json() == []
+    assert [r["id"] for r in client.get("/notes/search", params={"q": 'ocar*'}).json()] == [note_id]
+    assert client.get("/notes/search", params={"q": '"" *'}).status_code == 400
+
+def test_cursor_paging_visits_every_match_once(client):
+    # Identical notes tie on rank, so the pages rely on the id tie-break
+    ids = [create(client, "Theremin", "theremin theremin") for _ in range(5)]
+    ids += [create(client, "Notes", "one theremin among many other words") for _ in range(2)]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"q": "theremin", "limit": 2}
+        if cursor is not None:
+            params["cursor"] = cursor
+        response = client.get("/notes/search", params=params)
+        page = response.json()
+        assert len(page) <= 2
+        seen += [result["id"] for result in page]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted(ids)
+    assert seen[:5] == sorted(ids[:5])
+    assert client.get("/notes/search", params={"q": "theremin", "cursor": "not-a-cursor"}).status_code == 400
@@ -1,14 +1,111 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from sqlmodel import Session, select
 from models import User, get_session, engine
+from common.password_hasher import BCRYPT_ROUNDS, PasswordHasher
+from common.rate_limit import client_ip, rate_limiter
+from collections import OrderedDict
+import base64
+import copy
 import json
 import bcrypt
-from typing import Dict, Any
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, Tuple
 from pydantic import BaseModel
 
 security = HTTPBasic()
 
+class BcryptContext:
+    """The part of passlib's CryptContext API that PasswordHasher needs, on plain bcrypt."""
+
+    def __init__(self, rounds: int):
+        self.rounds = rounds
+
+    def hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+    def needs_update(self, hashed_password: str) -> bool:
+        # bcrypt hashes look like "$2b$12$...", where 12 is the work factor
+        try:
+            return int(hashed_password.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        if not self.verify(password, hashed_password):
+            return False, None
+        return True, self.hash(password) if self.needs_update(hashed_password) else None
+
+password_hasher = PasswordHasher(BcryptContext(BCRYPT_ROUNDS))
+
+# How long a successful password check is trusted before bcrypt runs again
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+class VerifiedCredentialCache:
+    """Bounded, TTL'd memory of credentials that already passed bcrypt.
+
+    Entries are keyed by an HMAC (with a per-process random key) of the username,
+    password, stored hash and active flag, so no plaintext is kept and a changed
+    hash or active flag simply stops matching.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._secret = os.urandom(32)
+        self._entries: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, username: str, password: str, hashed_password: str, is_active: bool) -> bytes:
+        message = "\0".join([username, password, hashed_password, str(is_active)]).encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def verify(
+        self,
+        username: str,
+        password: str,
+        hashed_password: str,
+        is_active: bool = True,
+        on_miss: Optional[Callable[[], None]] = None
+    ) -> bool:
+        key = self._key(username, password, hashed_password, is_active)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return True
+
+        # Runs only when bcrypt is about to, e.g. to rate limit the attempt
+        if on_miss is not None:
+            on_miss()
+        if not verify_password(password, hashed_password):
+            return False
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, username)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def invalidate_user(self, username: str):
+        with self._lock:
+            for key in [key for key, (_, owner) in self._entries.items() if owner == username]:
+                del self._entries[key]
+
+credential_cache = VerifiedCredentialCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
+
+# users.json is re-read only when the file changes
+_users_file_cache: Tuple[Optional[Tuple[int, int]], Dict[str, Dict[str, Any]]] = (None, {})
+
 class UserCreate(BaseModel):
     username: str
     email: str
@@ -17,11 +114,22 @@ class UserCreate(BaseModel):
 
 # Load users from JSON file
 def load_users() -> Dict[str, Dict[str, Any]]:
+    global _users_file_cache
+    try:
+        stat = os.stat("users.json")
+    except FileNotFoundError:
+        return {}
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if _users_file_cache[0] == signature:
+        return copy.deepcopy(_users_file_cache[1])
+
     try:
         with open("users.json", "r") as f:
-            return json.load(f)
+            users = json.load(f)
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
+    _users_file_cache = (signature, users)
+    return copy.deepcopy(users)
 
 # Save users to JSON file
 def save_users(users: Dict[str, Dict[str, Any]]):
@@ -30,28 +138,47 @@ def save_users(users: Dict[str, Dict[str, Any]]):
 
 # Hash password
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return password_hasher.hash(password)
 
 # Verify password
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return password_hasher.verify(plain_password, hashed_password)
 
 # Authentication dependency
 def get_current_user(
+    request: Request,
     credentials: HTTPBasicCredentials = Depends(security),
     session: Session = Depends(get_session)
 ):
+    # Requests answered from the credential cache cost no bcrypt and are not limited
+    def limit_attempt():
+        rate_limiter.check(client_ip(request), credentials.username)
+
     # First check database
     user = session.exec(select(User).where(User.username == credentials.username)).first()
     
-    if user and verify_password(credentials.password, user.hashed_password):
+    if user and credential_cache.verify(
+        credentials.username, credentials.password, user.hashed_password, user.is_active, limit_attempt
+    ):
+        if password_hasher.needs_update(user.hashed_password):
+            # Stored with an older work factor; upgrade it while we have the plain password
+            user.hashed_password = hash_password(credentials.password)
+            session.add(user)
+            session.commit()
+            session.refresh(user)
         return user
     
     # Fallback to JSON file
     users = load_users()
     if credentials.username in users:
         stored_user = users[credentials.username]
-        if verify_password(credentials.password, stored_user["hashed_password"]):
+        if credential_cache.verify(
+            credentials.username,
+            credentials.password,
+            stored_user["hashed_password"],
+            stored_user.get("is_active", True),
+            limit_attempt
+        ):
             return stored_user
     
     raise HTTPException(
@@ -60,6 +187,37 @@ def get_current_user(
         headers={"WWW-Authenticate": "Basic"},
     )
 
+# Username of valid Basic credentials, which scopes Idempotency-Keys; None otherwise.
+# It shares the credential cache with get_current_user, so the request's own
+# check after this one costs no second bcrypt.
+def basic_auth_subject(authorization: str) -> Optional[str]:
+    scheme, _, encoded = authorization.partition(" ")
+    if scheme.lower() != "basic":
+        return None
+    try:
+        username, _, password = base64.b64decode(encoded).decode("utf-8").partition(":")
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == username)).first()
+    if user is not None:
+        hashed_password, is_active = user.hashed_password, user.is_active
+    else:
+        stored_user = load_users().get(username)
+        if stored_user is None:
+            return None
+        hashed_password, is_active = stored_user["hashed_password"], stored_user.get("is_active", True)
+
+    try:
+        verified = credential_cache.verify(
+            username, password, hashed_password, is_active, lambda: rate_limiter.check(None, username)
+        )
+    except HTTPException:
+        # Rate limited or shedding load; the request's own check will answer that
+        return None
+    return username if verified else None
+
 # Create user in database
 def create_user_in_db(user_data: UserCreate, session: Session):
     # Check if username exists
@@ -1,16 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select
 from typing import List, Dict, Any
 import json
 
 from models import Student, User, create_db_and_tables, get_session, engine
-from auth import get_current_user, create_default_user, UserCreate, create_user_in_db, create_user_in_json, load_users
+from auth import get_current_user, basic_auth_subject, create_default_user, UserCreate, create_user_in_db, create_user_in_json, load_users, password_hasher
 from middleware import log_requests
 from database import get_db
+from common.idempotency import IdempotencyMiddleware, IdempotencyStore
+from common.query_log import QueryCountMiddleware, query_budget, query_stats, route_query_stats
+from common.query_audit import audit_query_plans, check_query_plans, require_query_audit_endpoint
 
 app = FastAPI(title="Student Management System", version="1.0.0")
 
+# Added first so it sits closest to the routes: X-DB-Queries counts the endpoint's own statements
+app.add_middleware(QueryCountMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +26,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Retried creates carrying an Idempotency-Key get the stored response
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=["/students/", "/register/"],
+    store=IdempotencyStore(engine),
+    subject=basic_auth_subject
+)
+
 # Add request logging middleware
 app.middleware("http")(log_requests)
 
@@ -29,13 +43,18 @@ def on_startup():
     create_db_and_tables()
     create_default_user()
 
+@app.on_event("shutdown")
+def on_shutdown():
+    # Logs scans an index would fix; fails the run under QUERY_AUDIT_STRICT
+    check_query_plans(engine, query_stats.examples())
+
 # Health check endpoint
 @app.get("/")
 def read_root():
     return {"message": "Student Management System API"}
 
 # User registration endpoint (public)
-@app.post("/register/", status_code=status.HTTP_201_CREATED)
+@app.post("/register/", status_code=status.HTTP_201_CREATED, dependencies=[Depends(query_budget(4))])
 def register_user(
     user_data: UserCreate,
     session: Session = Depends(get_db)
@@ -45,6 +64,9 @@ def register_user(
         user = create_user_in_db(user_data, session)
         return {"message": "User created successfully", "user": user}
     except Exception as e:
+        # An overloaded hashing pool would refuse the JSON fallback as well
+        if isinstance(e, HTTPException) and e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            raise
         # Fallback to JSON file if database fails
         try:
             user = create_user_in_json(user_data)
@@ -55,8 +77,31 @@ def register_user(
                 detail=f"Failed to create user: {str(json_error)}"
             )
 
+@app.get("/metrics/hashing")
+def password_hashing_metrics(current_user: User = Depends(get_current_user)):
+    return password_hasher.stats()
+
+@app.get("/metrics/queries")
+def query_metrics(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("total", pattern="^(total|p95|max|count)$"),
+    current_user: User = Depends(get_current_user)
+):
+    # Most expensive statement shapes seen by this worker
+    return query_stats.top(limit, sort)
+
+@app.get("/metrics/requests")
+def request_query_metrics(current_user: User = Depends(get_current_user)):
+    # Statements and DB time per request for each route, heaviest first
+    return route_query_stats.summary()
+
+@app.get("/metrics/query-plans", dependencies=[Depends(require_query_audit_endpoint)])
+def query_plan_audit(current_user: User = Depends(get_current_user)):
+    # Statements seen by this worker whose plan scans a whole table, with index suggestions
+    return audit_query_plans(engine, query_stats.examples())
+
 # Get current user info (protected)
-@app.get("/users/me/")
+@app.get("/users/me/", dependencies=[Depends(query_budget(3))])
 def get_current_user_info(current_user: User = Depends(get_current_user)):
     return {
         "username": current_user.username,
@@ -127,7 +172,7 @@ def create_student(
     return student
 
 # Get all students
-@app.get("/students/", response_model=List[Student])
+@app.get("/students/", response_model=List[Student], dependencies=[Depends(query_budget(3))])
 def read_students(session: Session = Depends(get_db)):
     students = session.exec(select(Student)).all()
     return students
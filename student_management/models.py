@@ -1,12 +1,16 @@
-from sqlmodel import SQLModel, Field, create_engine, Session, select
+from sqlmodel import SQLModel, Field, Session, select
+from common.sqlite_engine import create_sqlite_engine
+from common.query_log import install_query_log
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import json
+# Imported so create_all makes its table; see common.idempotency
+from common.idempotency import IdempotencyRecord  # noqa: F401
 
 class Student(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
-    age: int
+    age: int = Field(index=True)
     email: str = Field(unique=True, index=True)
     grades: str = Field(default="[]")  # Store grades as JSON string
     
@@ -24,11 +28,16 @@ class User(SQLModel, table=True):
     is_active: bool = Field(default=True)
 
 sqlite_url = "sqlite:///students.db"
-engine = create_engine(sqlite_url, echo=True)
+engine = create_sqlite_engine(sqlite_url)
+install_query_log(engine)
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist; add indexes declared since then
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
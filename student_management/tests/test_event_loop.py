@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from main import app
+from models import User, engine
+import auth
+import bcrypt
+import threading
+import time
+
+SLOW_CHECK_SECONDS = 1.0
+
+def test_slow_password_check_does_not_stall_other_requests(monkeypatch):
+    with TestClient(app) as client:
+        hashed_password = bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode()
+        with Session(engine) as session:
+            session.add(User(username="slowpoke", email="slowpoke@example.com", hashed_password=hashed_password))
+            session.commit()
+
+        verify_password = auth.verify_password
+
+        def slow_verify_password(plain_password, hashed_password):
+            time.sleep(SLOW_CHECK_SECONDS)
+            return verify_password(plain_password, hashed_password)
+
+        monkeypatch.setattr(auth, "verify_password", slow_verify_password)
+
+        # The idempotency middleware checks the credentials before the route does
+        responses = []
+        authenticated = threading.Thread(target=lambda: responses.append(client.post(
+            "/students/",
+            json={"name": "Slow", "age": 20, "email": "slow@example.com"},
+            auth=("slowpoke", "secret"),
+            headers={"Idempotency-Key": "slow-create"}
+        )))
+        authenticated.start()
+        time.sleep(0.1)
+
+        started = time.perf_counter()
+        assert client.get("/").status_code == 200
+        elapsed = time.perf_counter() - started
+        authenticated.join()
+
+    assert responses[0].status_code == 201
+    assert elapsed < SLOW_CHECK_SECONDS / 4
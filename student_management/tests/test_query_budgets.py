@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from main import app
+from models import User, engine
+from common import query_log
+import bcrypt
+import pytest
+
+@pytest.fixture
+def client(monkeypatch):
+    # Going over a query budget raises instead of logging
+    monkeypatch.setattr(query_log, "QUERY_BUDGET_STRICT", True)
+    with TestClient(app) as client:
+        yield client
+
+def test_authenticating_with_a_stale_hash_fits_the_budget(client):
+    # Stored with another work factor, so the first authenticated request rehashes it
+    stale_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt(5)).decode()
+    with Session(engine) as session:
+        session.add(User(username="stale", email="stale@example.com", hashed_password=stale_hash))
+        session.commit()
+
+    response = client.get("/users/me/", auth=("stale", "secret"))
+    assert response.status_code == 200
+    assert response.json()["username"] == "stale"
+    # get_current_user's select, update and reload: the whole budget of /users/me/
+    assert int(response.headers["x-db-queries"]) == 3
+
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == "stale")).one()
+        assert user.hashed_password.startswith("$2b$04$")
@@ -0,0 +1,113 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel
+from common.idempotency import IdempotencyMiddleware, IdempotencyStore
+from common.sqlite_engine import create_sqlite_engine
+from datetime import timedelta
+import pytest
+import threading
+import time
+
+@pytest.fixture
+def store(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'idempotency.db'}")
+    SQLModel.metadata.create_all(engine)
+    return IdempotencyStore(engine)
+
+def make_app(store: IdempotencyStore):
+    app = FastAPI()
+    app.state.calls = 0
+    app.state.release = threading.Event()
+    app.state.release.set()
+    app.state.entered = threading.Event()
+
+    @app.post("/orders")
+    def create_order(payload: dict):
+        app.state.calls += 1
+        app.state.entered.set()
+        app.state.release.wait(5)
+        if payload.get("fail"):
+            raise HTTPException(status_code=503, detail="try again")
+        return {"order": app.state.calls, "item": payload.get("item")}
+
+    app.add_middleware(IdempotencyMiddleware, paths=["/orders"], store=store)
+    return app
+
+def test_a_retry_replays_the_stored_response(store):
+    app = make_app(store)
+    client = TestClient(app)
+    first = client.post("/orders", json={"item": "pen"}, headers={"Idempotency-Key": "k1"})
+    retry = client.post("/orders", json={"item": "pen"}, headers={"Idempotency-Key": "k1"})
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json() == {"order": 1, "item": "pen"}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert app.state.calls == 1
+
+def test_a_retry_while_the_first_request_runs_gets_409(store):
+    app = make_app(store)
+    app.state.release.clear()
+    results = {}
+
+    def first_request():
+        results["first"] = TestClient(app).post("/orders", json={"item": "pen"}, headers={"Idempotency-Key": "k2"})
+
+    thread = threading.Thread(target=first_request)
+    thread.start()
+    try:
+        assert app.state.entered.wait(5)
+        retry = TestClient(app).post("/orders", json={"item": "pen"}, headers={"Idempotency-Key": "k2"})
+        assert retry.status_code == 409
+    finally:
+        app.state.release.set()
+        thread.join()
+    assert results["first"].status_code == 200
+    assert app.state.calls == 1
+
+def test_the_same_key_with_a_different_body_gets_422(store):
+    app = make_app(store)
+    client = TestClient(app)
+    client.post("/orders", json={"item": "pen"}, headers={"Idempotency-Key": "k3"})
+    reused = client.post("/orders", json={"item": "ink"}, headers={"Idempotency-Key": "k3"})
+
+    assert reused.status_code == 422
+    assert app.state.calls == 1
+
+def test_server_errors_are_not_stored(store):
+    app = make_app(store)
+    client = TestClient(app)
+    failed = client.post("/orders", json={"item": "pen", "fail": True}, headers={"Idempotency-Key": "k4"})
+    retry = client.post("/orders", json={"item": "pen", "fail": True}, headers={"Idempotency-Key": "k4"})
+
+    assert failed.status_code == retry.status_code == 503
+    assert "idempotent-replayed" not in retry.headers
+    assert app.state.calls == 2
+
+def test_a_retry_takes_over_after_the_lease_expires(store):
+    store.lease = timedelta(milliseconds=50)
+    outcome, abandoned = store.claim("k5", "fingerprint")
+    assert outcome == "new"
+    # The worker holding the key died; until the lease runs out the key stays busy
+    assert store.claim("k5", "fingerprint")[0] == "conflict"
+    time.sleep(0.1)
+
+    outcome, retry = store.claim("k5", "fingerprint")
+    assert outcome == "new"
+    store.complete(retry, 201, [(b"content-type", b"application/json")], b'{"order": 2}')
+    outcome, stored = store.claim("k5", "fingerprint")
+    assert (outcome, stored.status_code, stored.body) == ("replay", 201, b'{"order": 2}')
+
+def test_a_stale_claimant_does_not_overwrite_the_retry(store):
+    store.lease = timedelta(milliseconds=50)
+    _, stale = store.claim("k6", "fingerprint")
+    time.sleep(0.1)
+    _, retry = store.claim("k6", "fingerprint")
+    store.complete(retry, 201, [], b'{"order": 2}')
+
+    # The first worker was only slow, and finishes after the retry
+    store.complete(stale, 201, [], b'{"order": 1}')
+    store.release(stale)
+
+    outcome, stored = store.claim("k6", "fingerprint")
+    assert (outcome, stored.body) == ("replay", b'{"order": 2}')
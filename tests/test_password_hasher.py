@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from common.password_hasher import PASSWORD_HASH_MAX_QUEUE, PASSWORD_HASH_WORKERS, PasswordHasher
+import threading
+
+class SlowContext:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def hash(self, password: str) -> str:
+        self.release.wait(5)
+        return "hashed:" + password
+
+def test_default_queue_leaves_most_of_the_threadpool_free():
+    # Every admitted caller blocks one of the 40 threadpool threads
+    assert PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE <= 20
+
+def test_callers_beyond_the_queue_are_shed_without_waiting():
+    context = SlowContext()
+    hasher = PasswordHasher(context, workers=1, max_queue=1)
+
+    def attempt(_) -> str:
+        try:
+            return hasher.hash("secret")
+        except HTTPException as e:
+            # Turned away at once, while the other two still hold both slots
+            context.release.set()
+            return e.status_code
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(attempt, range(3)))
+
+    assert sorted(results, key=str) == [503, "hashed:secret", "hashed:secret"]
+    assert hasher.stats()["shed"] == 1
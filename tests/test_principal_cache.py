@@ -0,0 +1,32 @@
+from common import principal_cache as principal_cache_module
+from common.principal_cache import PrincipalCache, invalidate_principal
+import time
+
+def test_an_entry_expires_with_its_token():
+    cache = PrincipalCache(max_entries=10, ttl=300)
+    cache.put("alice", {"username": "alice"}, token_exp=time.time() + 0.05)
+    cache.put("bob", {"username": "bob"}, token_exp=time.time() + 600)
+    assert cache.get("alice") == {"username": "alice"}
+    time.sleep(0.1)
+
+    assert cache.get("alice") is None
+    # A token outliving the TTL does not extend the entry past it
+    assert cache._entries["bob"][0] <= time.time() + 300
+
+def test_the_oldest_entry_is_evicted_past_max_entries():
+    cache = PrincipalCache(max_entries=2, ttl=300)
+    for name in ("alice", "bob"):
+        cache.put(name, {"username": name})
+    cache.get("alice")
+    cache.put("carol", {"username": "carol"})
+    assert [cache.get(name) is not None for name in ("alice", "bob", "carol")] == [True, False, True]
+
+def test_invalidate_principal_drops_the_shared_entry(monkeypatch):
+    cache = PrincipalCache(max_entries=10, ttl=300)
+    monkeypatch.setattr(principal_cache_module, "principal_cache", cache)
+    cache.put("alice", {"username": "alice"})
+    cache.put("bob", {"username": "bob"})
+
+    invalidate_principal("alice")
+    assert cache.get("alice") is None
+    assert cache.get("bob") == {"username": "bob"}
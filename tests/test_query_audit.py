@@ -0,0 +1,46 @@
+from sqlalchemy import text
+from common import query_audit
+from common.query_audit import check_query_plans
+from common.sqlite_engine import create_sqlite_engine
+import pytest
+
+STATEMENTS = [("SELECT item.id FROM item WHERE item.owner = ?", 1)]
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, owner INTEGER NOT NULL)"))
+    yield engine
+    engine.dispose()
+
+def test_strict_check_fails_on_a_scan_an_index_would_fix(engine):
+    with pytest.raises(AssertionError, match=r"CREATE INDEX ix_item_owner ON item \(owner\)"):
+        check_query_plans(engine, STATEMENTS, strict=True)
+
+def test_lenient_check_reports_the_scan(engine):
+    findings = check_query_plans(engine, STATEMENTS, strict=False)
+    assert [finding["suggested_index"] for finding in findings] == ["CREATE INDEX ix_item_owner ON item (owner)"]
+
+def test_strict_defaults_to_query_audit_strict(engine, monkeypatch):
+    monkeypatch.setattr(query_audit, "QUERY_AUDIT_STRICT", True)
+    with pytest.raises(AssertionError):
+        check_query_plans(engine, STATEMENTS)
+
+def test_indexed_query_passes_strict_check(engine):
+    with engine.begin() as connection:
+        connection.execute(text("CREATE INDEX ix_item_owner ON item (owner)"))
+    assert check_query_plans(engine, STATEMENTS, strict=True) == []
+
+def test_unfixable_scan_does_not_fail(engine):
+    # Nothing to index for a query without a filter
+    assert check_query_plans(engine, [("SELECT item.id FROM item", 0)], strict=True)
+
+def test_dropped_index_is_seen_by_the_next_audit(engine):
+    with engine.begin() as connection:
+        connection.execute(text("CREATE INDEX ix_item_owner ON item (owner)"))
+    assert check_query_plans(engine, STATEMENTS, strict=True) == []
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_item_owner"))
+    with pytest.raises(AssertionError):
+        check_query_plans(engine, STATEMENTS, strict=True)
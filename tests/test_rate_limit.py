@@ -0,0 +1,48 @@
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from common import rate_limit
+from common.rate_limit import RateLimiter, SQLiteBucketStore, limit_login_attempts
+import pytest
+import sqlite3
+import threading
+import time
+
+def test_sqlite_store_shares_buckets_between_instances(tmp_path):
+    path = str(tmp_path / "rate_limit.db")
+    # Two workers on the same host, each with its own store
+    first = RateLimiter(SQLiteBucketStore(path), username_burst=2, username_per_minute=0.001)
+    second = RateLimiter(SQLiteBucketStore(path), username_burst=2, username_per_minute=0.001)
+    first.check(None, "alice")
+    second.check(None, "alice")
+    with pytest.raises(HTTPException) as raised:
+        first.check(None, "alice")
+    assert raised.value.status_code == 429
+
+def test_waiting_for_the_store_does_not_block_the_event_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "rate_limit.db")
+    monkeypatch.setattr(rate_limit, "rate_limiter", RateLimiter(SQLiteBucketStore(path)))
+
+    app = FastAPI()
+
+    @app.post("/token", dependencies=[Depends(limit_login_attempts)])
+    async def token():
+        return {}
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    # Another process holds the write lock, so the login's BEGIN IMMEDIATE waits
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    with TestClient(app) as client:
+        login = threading.Thread(target=client.post, args=("/token",), kwargs={"params": {"username": "alice"}})
+        login.start()
+        time.sleep(0.2)
+        started = time.perf_counter()
+        assert client.get("/ping").status_code == 200
+        pinged = time.perf_counter() - started
+        blocker.execute("ROLLBACK")
+        login.join()
+    blocker.close()
+    assert pinged < 0.5